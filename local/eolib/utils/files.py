@@ -7,6 +7,7 @@ Created on Fri Apr 27 11:46:14 2018
 """
 
 import os
+import socket
 
 
 # ---------------------------------------------------------------------------------------------------------------------
@@ -208,6 +209,17 @@ def get_file_list(search_folder_path,
     return file_list
 
 # .....................................................................................................................
+    
+# Function for writing files without other processes ever seeing a partially written file
+def write_file_atomic(file_path, file_contents):
+    
+    # Write to a temporary file first (unique to this machine/process), then move it into place
+    temp_path = "{}.{}-{}.tmp".format(file_path, socket.gethostname(), os.getpid())
+    with open(temp_path, "w") as out_file:
+        out_file.write(file_contents)
+    os.replace(temp_path, file_path)
+
+# .....................................................................................................................
 
 # ---------------------------------------------------------------------------------------------------------------------
 #%% GUI Functions
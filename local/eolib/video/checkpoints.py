@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:11:48 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+
+from local.eolib.utils.files import write_file_atomic
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Render_Checkpoint:
+    
+    # .................................................................................................................
+    
+    def __init__(self, output_path, render_signature, total_frames):
+        
+        # Store inputs
+        self.output_path = output_path
+        self.render_signature = render_signature
+        self.total_frames = total_frames
+        
+        # Checkpoint data is kept in a folder beside the output, using the same file type for each segment
+        output_name_only, self.output_extension = os.path.splitext(os.path.basename(output_path))
+        self.checkpoint_folder = os.path.join(os.path.dirname(output_path), "{}.checkpoint".format(output_name_only))
+        self.state_path = os.path.join(self.checkpoint_folder, "state.json")
+        
+        # Load previous progress, but only if it came from an identical render
+        self._completed_list = []
+        saved_state = self._load_state()
+        if saved_state is not None:
+            if saved_state.get("signature") == render_signature:
+                self._completed_list = saved_state.get("completed", [])
+            else:
+                print("")
+                print("Render settings changed, ignoring old checkpoint: {}".format(self.checkpoint_folder))
+        
+        # Only keep segments that actually exist
+        self._completed_list = [each_entry for each_entry in self._completed_list
+                                if os.path.exists(os.path.join(self.checkpoint_folder, each_entry["file_name"]))]
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        return "Render checkpoint ({} / {} frames done): {}".format(self.resume_index(),
+                                                                   self.total_frames,
+                                                                   self.checkpoint_folder)
+    
+    # .................................................................................................................
+    
+    def resume_index(self):
+        
+        # Figure out how many frames (starting from the beginning) have been completed without any gaps
+        resume_index = 0
+        for each_entry in sorted(self._completed_list, key = lambda entry: entry["start"]):
+            if each_entry["start"] != resume_index:
+                break
+            resume_index = each_entry["end"]
+        
+        return resume_index
+    
+    # .................................................................................................................
+    
+    def get_segment_path(self, start_index):
+        
+        os.makedirs(self.checkpoint_folder, exist_ok = True)
+        segment_name = "frames_{:08d}{}".format(start_index, self.output_extension)
+        
+        return os.path.join(self.checkpoint_folder, segment_name)
+    
+    # .................................................................................................................
+    
+    def mark_complete(self, start_index, end_index):
+        
+        # Nothing to record if no frames were written
+        if end_index <= start_index:
+            return
+        
+        # Record the (finished) segment & save state right away, so it isn't lost if the render crashes later
+        segment_name = os.path.basename(self.get_segment_path(start_index))
+        self._completed_list = [each_entry for each_entry in self._completed_list
+                                if each_entry["start"] != start_index]
+        self._completed_list.append({"start": start_index, "end": end_index, "file_name": segment_name})
+        self._save_state()
+    
+    # .................................................................................................................
+    
+    def segment_paths(self):
+        
+        # Get the paths to every completed segment, in order, up to the resume point
+        resume_index = self.resume_index()
+        sorted_entries = sorted(self._completed_list, key = lambda entry: entry["start"])
+        
+        return [os.path.join(self.checkpoint_folder, each_entry["file_name"])
+                for each_entry in sorted_entries if each_entry["end"] <= resume_index]
+    
+    # .................................................................................................................
+    
+    def is_finished(self):
+        return self.resume_index() >= self.total_frames
+    
+    # .................................................................................................................
+    
+    def remove(self):
+        shutil.rmtree(self.checkpoint_folder, ignore_errors = True)
+    
+    # .................................................................................................................
+    
+    def _load_state(self):
+        
+        if not os.path.exists(self.state_path):
+            return None
+        
+        # A broken state file just means starting over
+        try:
+            with open(self.state_path, "r") as in_file:
+                return json.load(in_file)
+        except (OSError, ValueError):
+            return None
+    
+    # .................................................................................................................
+    
+    def _save_state(self):
+        
+        state_dict = {"signature": self.render_signature,
+                      "total_frames": self.total_frames,
+                      "completed": self._completed_list}
+        write_file_atomic(self.state_path, json.dumps(state_dict, indent = 2))
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def get_render_signature(video_path_list, frame_index_lists, settings_dict):
+    
+    # Build a hash of everything that affects the output, so checkpoints are only re-used for identical renders
+    signature_hash = hashlib.sha1()
+    for each_path in video_path_list:
+        file_stat = os.stat(each_path)
+        signature_hash.update("{}|{}|{}".format(os.path.abspath(each_path),
+                                                file_stat.st_size,
+                                                file_stat.st_mtime_ns).encode("utf-8"))
+    for each_index_list in frame_index_lists:
+        signature_hash.update(np.int32(each_index_list).tobytes())
+    signature_hash.update(json.dumps(settings_dict, sort_keys = True).encode("utf-8"))
+    
+    return signature_hash.hexdigest()
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
+
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 15:21:48 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import numpy as np
+
+from time import perf_counter
+
+from local.eolib.video.resizing import Tile_Resizer
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Tile_Compositor:
+    
+    # .................................................................................................................
+    
+    def __init__(self, num_rows, num_cols, tileWH, num_tiles = None, blank_color = (0, 0, 0),
+                 hold_missing_tiles = True, resize_policy = "auto"):
+        
+        # Store tiling layout
+        self.num_rows = num_rows
+        self.num_cols = num_cols
+        self.tileWH = tuple(tileWH)
+        self.num_cells = num_rows * num_cols
+        self.num_tiles = self.num_cells if num_tiles is None else num_tiles
+        self.blank_color = blank_color
+        self.hold_missing_tiles = hold_missing_tiles
+        self._resizer = Tile_Resizer(resize_policy)
+        
+        # Allocate the output canvas once. Every output frame is drawn directly into this image
+        tile_width, tile_height = self.tileWH
+        self.canvasWH = (tile_width * num_cols, tile_height * num_rows)
+        self._canvas = np.full((self.canvasWH[1], self.canvasWH[0], 3), blank_color, dtype = np.uint8)
+        
+        # Get a view into the canvas for each cell (left-to-right, top-to-bottom)
+        self._cell_views = []
+        for row_idx in range(num_rows):
+            y1, y2 = row_idx * tile_height, (row_idx + 1) * tile_height
+            for col_idx in range(num_cols):
+                x1, x2 = col_idx * tile_width, (col_idx + 1) * tile_width
+                self._cell_views.append(self._canvas[y1:y2, x1:x2])
+        
+        # Keep track of what each cell is showing, so cells are only re-drawn when they change
+        # (drawn cells also let missing frames hold the last good tile)
+        self._cell_drawn = [False] * self.num_cells
+        self._cell_blank = [True] * self.num_cells
+        self._dirty_cells = []
+        
+        # Keep track of time spent resizing, since it's usually the main cost of composing
+        self.last_resize_sec = 0.0
+        self.tiles_reused = 0
+        self.tiles_drawn = 0
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        out_string = ["Tile compositor"]
+        out_string += ["  Layout (rows x cols): {} x {}".format(self.num_rows, self.num_cols)]
+        out_string += ["  Tile size: {} x {}".format(*self.tileWH)]
+        out_string += ["  Canvas size: {} x {}".format(*self.canvasWH)]
+        out_string += ["  Resize policy: {}".format(self._resizer.policy)]
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def compose(self, frame_list, changed_tiles = None):
+        
+        # Draw each frame into it's cell. Cells beyond the number of tiles were painted blank on setup
+        # (unchanged tiles are skipped entirely, since the canvas still holds the previous tile)
+        self.last_resize_sec = 0.0
+        self._dirty_cells = []
+        for tile_idx, each_frame in enumerate(frame_list):
+            if changed_tiles is not None and not changed_tiles[tile_idx]:
+                self.tiles_reused += 1
+                continue
+            self.set_tile(tile_idx, each_frame)
+        
+        return self._canvas
+    
+    # .................................................................................................................
+    
+    def set_tile(self, tile_index, frame):
+        
+        cell_view = self._cell_views[tile_index]
+        
+        # Hold the last good tile for bad frames (e.g. a video ending early), or blank the cell if there isn't one
+        # (cells that are already blank are left alone)
+        if frame is None:
+            hold_tile = (self.hold_missing_tiles and self._cell_drawn[tile_index])
+            if not (hold_tile or self._cell_blank[tile_index]):
+                cell_view[:] = self.blank_color
+                self._cell_drawn[tile_index] = False
+                self._cell_blank[tile_index] = True
+                self._dirty_cells.append(tile_index)
+            return
+        
+        # Record that the cell is changing
+        self._cell_drawn[tile_index] = True
+        self._cell_blank[tile_index] = False
+        self._dirty_cells.append(tile_index)
+        self.tiles_drawn += 1
+        
+        # Copy frames that are already the right size, otherwise resize directly into the canvas
+        if frame.shape[0:2] == cell_view.shape[0:2]:
+            np.copyto(cell_view, frame)
+        else:
+            t_start = perf_counter()
+            self._resizer.resize_into(frame, cell_view)
+            self.last_resize_sec += (perf_counter() - t_start)
+    
+    # .................................................................................................................
+    
+    def canvas(self):
+        # Note: the canvas is re-used for every output frame, so copy it if it needs to be kept!
+        return self._canvas
+    
+    # .................................................................................................................
+    
+    def dirty_cells(self):
+        # Report which cells were changed by the most recent compose() call
+        return list(self._dirty_cells)
+    
+    # .................................................................................................................
+    
+    def is_dirty(self):
+        # Check if the canvas changed at all on the most recent compose() call
+        return len(self._dirty_cells) > 0
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 09:42:10 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import cv2
+import hashlib
+import numpy as np
+
+from local.eolib.utils.files import loadHistoryFile, saveHistoryFile
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Seek_Planner:
+    
+    # .................................................................................................................
+    
+    def __init__(self, keyframe_indices, initial_grab_sec = 0.002, initial_seek_sec = 0.030, alpha = 0.9):
+        
+        # Store keyframe listing (must be sorted!)
+        self.keyframe_indices = np.int64(keyframe_indices)
+        
+        # Store (measured) costs of each way of moving through a video
+        self.grab_sec = initial_grab_sec
+        self.seek_sec = initial_seek_sec
+        
+        # Store averaging parameters
+        self.alpha = max(min(1.0, alpha), 0.0)
+        self._inv_alpha = 1 - self.alpha
+        
+        # Keep track of how often we choose to seek, for feedback
+        self.seek_count = 0
+        self.scan_count = 0
+        self._enabled = (len(self.keyframe_indices) > 0)
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        out_string = ["Seek planner"]
+        out_string += ["  Keyframes: {}".format(len(self.keyframe_indices))]
+        out_string += ["  Grab cost (ms): {:.3f}".format(1000 * self.grab_sec)]
+        out_string += ["  Seek cost (ms): {:.3f}".format(1000 * self.seek_sec)]
+        out_string += ["  Seeks / scans: {} / {}".format(self.seek_count, self.scan_count)]
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def nearest_keyframe(self, frame_index):
+        
+        # Find the last keyframe at or before the target frame
+        insert_idx = np.searchsorted(self.keyframe_indices, frame_index, side = "right")
+        if insert_idx == 0:
+            return None
+        
+        return int(self.keyframe_indices[insert_idx - 1])
+    
+    # .................................................................................................................
+    
+    def choose_seek(self, current_index, target_index):
+        
+        # Returns the keyframe index to seek to, or None if sequential grabbing is cheaper
+        
+        # Never seek backwards (or at all, if seeking was found to be unreliable)
+        if (not self._enabled) or (target_index <= current_index):
+            self.scan_count += 1
+            return None
+        
+        # Seeking is only useful if there is a keyframe between our current position and the target
+        keyframe_index = self.nearest_keyframe(target_index)
+        if (keyframe_index is None) or (keyframe_index <= current_index):
+            self.scan_count += 1
+            return None
+        
+        # Compare the cost of grabbing every frame vs. jumping to the keyframe and grabbing from there
+        scan_cost = (target_index - current_index) * self.grab_sec
+        seek_cost = self.seek_sec + (target_index - keyframe_index) * self.grab_sec
+        if seek_cost >= scan_cost:
+            self.scan_count += 1
+            return None
+        
+        self.seek_count += 1
+        return keyframe_index
+    
+    # .................................................................................................................
+    
+    def record_grabs(self, num_frames, elapsed_sec):
+        
+        # Don't bother updating on empty grabs, since they only measure overhead
+        if num_frames < 1:
+            return
+        
+        per_frame_sec = elapsed_sec / num_frames
+        self.grab_sec = self.alpha * self.grab_sec + self._inv_alpha * per_frame_sec
+    
+    # .................................................................................................................
+    
+    def record_seek(self, elapsed_sec):
+        self.seek_sec = self.alpha * self.seek_sec + self._inv_alpha * elapsed_sec
+    
+    # .................................................................................................................
+    
+    def disable(self):
+        # Used to fall back to sequential reading if seeking turns out to be inaccurate
+        self._enabled = False
+    
+    # .................................................................................................................
+    
+    def is_enabled(self):
+        return self._enabled
+    
+    # .................................................................................................................
+
+
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
+class Probe_Cache:
+    
+    # .................................................................................................................
+    
+    def __init__(self, cache_file_path):
+        
+        # Store pathing
+        self.cache_file_path = cache_file_path
+        
+        # Load any existing cache data. A broken cache file is just ignored, since it can be rebuilt
+        try:
+            loaded_entries = loadHistoryFile(cache_file_path)
+        except Exception:
+            loaded_entries = None
+        self._entries = {} if loaded_entries is None else loaded_entries
+        
+        # Keep track of which entries have changed, so only those need to be saved
+        self._changed_keys = set()
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        return "Probe cache ({} entries): {}".format(len(self._entries), self.cache_file_path)
+    
+    # .................................................................................................................
+    
+    def get(self, video_path, select = None):
+        
+        # Only return cached data if the file hasn't changed since it was probed
+        cache_key, file_size, file_mtime_ns = self._get_key_and_signature(video_path)
+        cache_entry = self._entries.get(cache_key, None)
+        if cache_entry is None:
+            return None
+        if cache_entry.get("file_size") != file_size or cache_entry.get("file_mtime_ns") != file_mtime_ns:
+            return None
+        
+        if select is None:
+            return cache_entry
+        else:
+            return cache_entry.get(select, None)
+    
+    # .................................................................................................................
+    
+    def update(self, video_path, **new_data):
+        
+        # Start a new entry if the file changed (or was never probed), otherwise add to the existing entry
+        cache_key, file_size, file_mtime_ns = self._get_key_and_signature(video_path)
+        cache_entry = self.get(video_path)
+        if cache_entry is None:
+            cache_entry = {"file_size": file_size, "file_mtime_ns": file_mtime_ns}
+        
+        self._entries[cache_key] = {**cache_entry, **new_data}
+        self._changed_keys.add(cache_key)
+    
+    # .................................................................................................................
+    
+    def save(self):
+        
+        # Nothing to do if nothing was changed
+        if len(self._changed_keys) == 0:
+            return None
+        
+        # Only save changes, so entries added by other runs aren't lost when the files are merged
+        changed_entries = {each_key: self._entries[each_key] for each_key in self._changed_keys}
+        saveHistoryFile(self.cache_file_path, changed_entries)
+        self._changed_keys = set()
+        
+        return self.cache_file_path
+    
+    # .................................................................................................................
+    
+    def _get_key_and_signature(self, video_path):
+        file_stat = os.stat(video_path)
+        return os.path.abspath(video_path), file_stat.st_size, file_stat.st_mtime_ns
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def open_raw_capture(video_path):
+    
+    # Open a capture that only demuxes packets (i.e. no decoding), if the OpenCV build supports it
+    try:
+        raw_capture = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [cv2.CAP_PROP_FORMAT, -1])
+    except (cv2.error, TypeError, AttributeError):
+        return None
+    
+    if not raw_capture.isOpened():
+        raw_capture.release()
+        return None
+    
+    return raw_capture
+
+# .....................................................................................................................
+
+def scan_video_index(video_path):
+    
+    # Prefer a demux-only pass, but fall back to grabbing (decoding) if raw packet access isn't available
+    capture = open_raw_capture(video_path)
+    if capture is None:
+        capture = cv2.VideoCapture(video_path)
+        if not capture.isOpened():
+            capture.release()
+            return None
+    
+    # Keyframe flags are only reported by the FFmpeg backend in newer versions of OpenCV
+    keyframe_prop = getattr(cv2, "CAP_PROP_LRF_HAS_KEY_FRAME", None)
+    
+    # Step through every packet once, recording the timing of each frame & which are keyframes. This also counts
+    # every frame that can actually be pulled from the video, which is often not the reported frame count!
+    keyframe_list = []
+    timestamp_list = []
+    while capture.grab():
+        if keyframe_prop is not None and capture.get(keyframe_prop) > 0:
+            keyframe_list.append(len(timestamp_list))
+        timestamp_list.append(capture.get(cv2.CAP_PROP_POS_MSEC))
+    capture.release()
+    
+    # Packets are in decoding order, which doesn't match the presentation order if the video has B-frames.
+    # Frames are read out in presentation order, so sorting gives the timestamp of each frame index
+    video_index = {"frame_count": len(timestamp_list),
+                   "keyframes": None if keyframe_prop is None else np.uint32(keyframe_list),
+                   "timestamps_ms": np.sort(np.float64(timestamp_list))}
+    
+    return video_index
+
+# .....................................................................................................................
+
+def get_video_index(video_path, probe_cache = None, cache_folder = None):
+    
+    # Re-use a previous scan if possible. Scan results are kept in a (compact) index file rather than the probe cache,
+    # since the timing tables of long videos can be very large
+    video_index = load_video_index(video_path, cache_folder)
+    
+    # Otherwise scan the video (once, for everything) and save the results for re-use
+    if video_index is None:
+        video_index = scan_video_index(video_path)
+        if video_index is None:
+            return None
+        save_video_index(video_path, video_index, cache_folder)
+    
+    # Keep the frame count in the probe cache, so it's available without loading the full index
+    if probe_cache is not None and probe_cache.get(video_path, "true_frame_count") != video_index["frame_count"]:
+        probe_cache.update(video_path, true_frame_count = video_index["frame_count"])
+    
+    return video_index
+
+# .....................................................................................................................
+
+def get_true_frame_count(video_path, probe_cache = None, cache_folder = None):
+    
+    # Use the frame count from the probe cache if possible, since it doesn't require loading the full index
+    true_frame_count = None if probe_cache is None else probe_cache.get(video_path, "true_frame_count")
+    if true_frame_count is not None:
+        return true_frame_count
+    
+    video_index = get_video_index(video_path, probe_cache, cache_folder)
+    
+    return None if video_index is None else video_index["frame_count"]
+
+# .....................................................................................................................
+
+def get_keyframe_index(video_path, cache_folder = None):
+    video_index = get_video_index(video_path, cache_folder = cache_folder)
+    return None if video_index is None else video_index["keyframes"]
+
+# .....................................................................................................................
+
+def get_time_sampled_indices(timestamps_ms, num_samples):
+    
+    # Nothing to search through if there's only one frame
+    if len(timestamps_ms) < 2:
+        return np.zeros(num_samples, dtype = np.int32)
+    
+    # Spread target times evenly over the (real) duration of the video
+    target_times_ms = np.linspace(timestamps_ms[0], timestamps_ms[-1], num_samples)
+    
+    # Find the frames on either side of each target time and pick whichever is closer
+    after_idx = np.clip(np.searchsorted(timestamps_ms, target_times_ms), 1, len(timestamps_ms) - 1)
+    before_idx = after_idx - 1
+    before_dist = target_times_ms - timestamps_ms[before_idx]
+    after_dist = timestamps_ms[after_idx] - target_times_ms
+    nearest_idx = np.where(after_dist < before_dist, after_idx, before_idx)
+    
+    return np.int32(nearest_idx)
+
+# .....................................................................................................................
+
+def get_index_path(video_path, cache_folder = None, suffix = None):
+    
+    # Store index files next to the video if a cache folder isn't given
+    suffix = VIDEO_INDEX_SUFFIX if suffix is None else suffix
+    video_name = os.path.basename(video_path)
+    if cache_folder is None:
+        return os.path.join(os.path.dirname(video_path), "{}{}".format(video_name, suffix))
+    
+    # Use a hash of the full path to avoid clashes between identically named videos in the cache folder
+    path_hash = hashlib.sha1(os.path.abspath(video_path).encode("utf-8")).hexdigest()[:12]
+    return os.path.join(cache_folder, "{}-{}{}".format(video_name, path_hash, suffix))
+
+# .....................................................................................................................
+
+def get_file_signature(video_path):
+    
+    # Used to check if cached data still matches the video file
+    file_stat = os.stat(video_path)
+    return np.int64([file_stat.st_size, file_stat.st_mtime_ns])
+
+# .....................................................................................................................
+
+def load_index_data(video_path, cache_folder = None, suffix = None):
+    
+    # Bail if there is no saved index
+    index_path = get_index_path(video_path, cache_folder, suffix)
+    if not os.path.exists(index_path):
+        return None
+    
+    # Load the index, but only return it if it was built from the current version of the video file
+    try:
+        with np.load(index_path) as index_data:
+            saved_signature = index_data["signature"]
+            loaded_data = {each_key: index_data[each_key] for each_key in index_data.files if each_key != "signature"}
+    except Exception:
+        return None
+    
+    if not np.array_equal(saved_signature, get_file_signature(video_path)):
+        return None
+    
+    return loaded_data
+
+# .....................................................................................................................
+
+def save_index_data(video_path, data_dict, cache_folder = None, suffix = None):
+    
+    index_path = get_index_path(video_path, cache_folder, suffix)
+    
+    # Saving is only an optimization, so don't crash if the folder isn't writeable
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok = True)
+        with open(index_path, "wb") as out_file:
+            np.savez_compressed(out_file, signature = get_file_signature(video_path), **data_dict)
+    except OSError as err:
+        print("")
+        print("Couldn't save index: {}".format(index_path))
+        print(err)
+        return None
+    
+    return index_path
+
+# .....................................................................................................................
+
+def load_video_index(video_path, cache_folder = None):
+    
+    index_data = load_index_data(video_path, cache_folder)
+    if index_data is None:
+        return None
+    
+    # Keyframes aren't reported by every version of OpenCV, which is stored separately from having no keyframes
+    try:
+        video_index = {"frame_count": int(index_data["frame_count"]),
+                       "keyframes": index_data["keyframes"] if bool(index_data["has_keyframes"]) else None,
+                       "timestamps_ms": index_data["timestamps_ms"]}
+    except KeyError:
+        return None
+    
+    return video_index
+
+# .....................................................................................................................
+
+def save_video_index(video_path, video_index, cache_folder = None):
+    
+    keyframes = video_index["keyframes"]
+    index_data = {"frame_count": np.int64(video_index["frame_count"]),
+                  "keyframes": np.uint32([]) if keyframes is None else np.uint32(keyframes),
+                  "has_keyframes": np.bool_(keyframes is not None),
+                  "timestamps_ms": np.float64(video_index["timestamps_ms"])}
+    
+    return save_index_data(video_path, index_data, cache_folder)
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Globals
+
+# Index files hold the frame count, timestamps & keyframes of a video, from a single scan
+VIDEO_INDEX_SUFFIX = ".index.npz"
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
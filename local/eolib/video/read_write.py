@@ -12,8 +12,20 @@ Created on Wed Jan 30 15:13:27 2019
 
 import os
 import cv2
+import queue
+import socket
+import shutil
+import tempfile
+import threading
+import subprocess
+import numpy as np
 import datetime as dt
 
+from time import perf_counter
+
+from local.eolib.utils.files import loadHistoryFile, saveHistoryFile
+from local.eolib.video.indexing import Seek_Planner, get_keyframe_index
+
 # ---------------------------------------------------------------------------------------------------------------------
 #%% Define classes
 
@@ -33,7 +45,6 @@ class Video_Recorder:
         # Create derived variables
         self.save_name = os.path.basename(save_path)
         self.save_name_only, self.save_extension = os.path.splitext(self.save_name)
-        self._fourcc = cv2.VideoWriter_fourcc(*codec)
         self._video_writer = None
         
         # Store start time
@@ -65,10 +76,11 @@ class Video_Recorder:
         if self._disabled:
             return False
         
-        # Perform timelapsing if enabled
-        if self._timelapse_enabled:
-            if (self._frame_count % self._timelapse_factor) != 0:
-                return False
+        # Perform timelapsing if enabled (counting every frame offered, not just the recorded ones)
+        frame_index = self._frame_count
+        self._frame_count += 1
+        if self._timelapse_enabled and (frame_index % self._timelapse_factor) != 0:
+            return False
         
         # If we haven't set the frame size yet, take the sizing info from the incoming frame
         if self.frameWH is None:
@@ -83,14 +95,18 @@ class Video_Recorder:
                 frame = cv2.resize(frame, dsize = self.frameWH)
         
         # Write the current frame
-        self._video_writer.write(frame)
-        self._frame_count += 1
+        self._write_frame(frame)
         
         # Return a value of true if a frame was recorded
         return True
         
     # .................................................................................................................
         
+    def _write_frame(self, frame):
+        self._video_writer.write(frame)
+        
+    # .................................................................................................................
+        
     def release(self):        
         if self._video_writer is not None:
             self._video_writer.release()
@@ -185,11 +201,28 @@ class Video_Recorder:
         
     # .................................................................................................................
     
-    def find_valid_codec(self):
+    def find_valid_codec(self, test_WH = None, candidate_codecs = None, num_test_frames = 30, cache_path = None):
         
-        # Function that should try making a few videos with various codecs to see which one works
+        # Try making short videos with various codecs to see which ones work & which is fastest
         # (different systems may support different codecs!)
-        raise NotImplementedError("Sorry, not done yet!")
+        test_WH = self.frameWH if test_WH is None else test_WH
+        if test_WH is None:
+            raise AttributeError("Frame size not set!")
+        ranking_list = rank_codecs(test_WH, self.fps, self.save_extension, candidate_codecs, num_test_frames,
+                                   cache_path)
+        
+        # Keep the current codec if nothing works
+        working_codecs = [each_result["codec"] for each_result in ranking_list if each_result["works"]]
+        if len(working_codecs) == 0:
+            return None
+        
+        # Switch over to the fastest codec (re-creating the writer if it was already set up)
+        self.codec = working_codecs[0]
+        if self._video_writer is not None and self._frame_count == 0:
+            self._video_writer.release()
+            self._create_video_writer()
+        
+        return self.codec
         
     # .................................................................................................................
         
@@ -213,7 +246,7 @@ class Video_Recorder:
             raise AttributeError("FPS not set")
         
         self._video_writer = cv2.VideoWriter(self.save_path,
-                                             self._fourcc,
+                                             cv2.VideoWriter_fourcc(*self.codec),
                                              self.fps,
                                              self.frameWH,
                                              is_color)
@@ -226,13 +259,304 @@ class Video_Recorder:
     
     
     
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
+class Video_Recorder_Threaded(Video_Recorder):
+    
+    # .................................................................................................................
+    
+    def __init__(self, save_path, recording_FPS, recording_WH = None, codec="X264", enabled = True,
+                 queue_size = 8, drop_when_full = False, copy_frames = True):
+        
+        # Store threading settings
+        self.queue_size = queue_size
+        self.drop_when_full = drop_when_full
+        self.copy_frames = copy_frames
+        
+        # Allocate storage for writer statistics
+        self._frames_queued = 0
+        self._frames_dropped = 0
+        self._frames_written = 0
+        self._max_queue_depth = 0
+        self._blocked_sec = 0.0
+        self._writer_error = None
+        
+        # Start the background writing thread
+        self._frame_queue = queue.Queue(maxsize = queue_size)
+        self._write_thread = threading.Thread(target = self._write_loop, daemon = True)
+        self._write_thread.start()
+        
+        # Set up the recorder as usual
+        super().__init__(save_path, recording_FPS, recording_WH, codec, enabled)
+    
+    # .................................................................................................................
+    
+    def queue_depth(self):
+        return self._frame_queue.qsize()
+    
+    # .................................................................................................................
+    
+    def stats(self):
+        
+        stats_dict = {"queue_size": self.queue_size,
+                      "queue_depth": self.queue_depth(),
+                      "max_queue_depth": self._max_queue_depth,
+                      "frames_queued": self._frames_queued,
+                      "frames_written": self._frames_written,
+                      "frames_dropped": self._frames_dropped,
+                      "blocked_sec": self._blocked_sec}
+        
+        return stats_dict
+    
+    # .................................................................................................................
+    
+    def add_stats(self, previous_stats):
+        
+        # Used to carry stats over from an earlier recorder (e.g. when recording in segments)
+        self._max_queue_depth = max(self._max_queue_depth, previous_stats["max_queue_depth"])
+        self._frames_queued += previous_stats["frames_queued"]
+        self._frames_written += previous_stats["frames_written"]
+        self._frames_dropped += previous_stats["frames_dropped"]
+        self._blocked_sec += previous_stats["blocked_sec"]
+    
+    # .................................................................................................................
+    
+    def report_stats(self, print_string = True, return_string = False):
+        
+        out_string = ["Recording queue stats:"]
+        out_string += ["  Frames written: {}".format(self._frames_written)]
+        out_string += ["  Frames dropped: {}".format(self._frames_dropped)]
+        out_string += ["  Max queue depth: {} / {}".format(self._max_queue_depth, self.queue_size)]
+        out_string += ["  Time blocked on full queue (s): {:.3f}".format(self._blocked_sec)]
+        str_to_print = "\n".join(out_string)
+        
+        if print_string:
+            print(str_to_print)
+        
+        if return_string:
+            return str_to_print
+    
+    # .................................................................................................................
+    
+    def release(self):
+        
+        # Make sure everything queued up gets written before closing the file
+        self._flush()
+        super().release()
+    
+    # .................................................................................................................
+    
+    def _write_frame(self, frame):
+        
+        # Pass along any errors from the writing thread
+        if self._writer_error is not None:
+            raise self._writer_error
+        
+        # Copy the frame, since the caller is free to modify it while we're still waiting to write it
+        queued_frame = frame.copy() if self.copy_frames else frame
+        
+        # Either drop frames or wait when the writer falls behind
+        if self.drop_when_full:
+            try:
+                self._frame_queue.put_nowait(queued_frame)
+            except queue.Full:
+                self._frames_dropped += 1
+                return
+        else:
+            t_start = perf_counter()
+            self._frame_queue.put(queued_frame)
+            self._blocked_sec += (perf_counter() - t_start)
+        
+        # Update stats
+        self._frames_queued += 1
+        self._max_queue_depth = max(self._max_queue_depth, self._frame_queue.qsize())
+    
+    # .................................................................................................................
+    
+    def _write_loop(self):
+        
+        while True:
+            
+            # A 'None' entry is used to signal that there are no more frames to write
+            next_frame = self._frame_queue.get()
+            if next_frame is None:
+                break
+            
+            # Don't keep trying to write after an error, but keep emptying the queue so the caller can't get stuck
+            if self._writer_error is not None:
+                continue
+            
+            try:
+                self._video_writer.write(next_frame)
+                self._frames_written += 1
+            except Exception as err:
+                self._writer_error = err
+    
+    # .................................................................................................................
+    
+    def _flush(self):
+        
+        # Tell the writing thread to finish up and wait for it
+        if self._write_thread is None:
+            return
+        
+        self._frame_queue.put(None)
+        self._write_thread.join()
+        self._write_thread = None
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+    
+    
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
+class Video_Recorder_FFmpeg(Video_Recorder):
+    
+    # .................................................................................................................
+    
+    def __init__(self, save_path, recording_FPS, recording_WH = None, encoder = "libx264", enabled = True,
+                 preset = "veryfast", threads = 0, pixel_format = "yuv420p", crf = None, container = None,
+                 ffmpeg_path = "ffmpeg", extra_args = None):
+        
+        # Store encoder settings (threads = 0 lets ffmpeg decide)
+        self.preset = preset
+        self.threads = threads
+        self.pixel_format = pixel_format
+        self.crf = crf
+        self.container = container
+        self.ffmpeg_path = ffmpeg_path
+        self.extra_args = [] if extra_args is None else list(extra_args)
+        self._ffmpeg_process = None
+        
+        # Set up the recorder as usual (the encoder name takes the place of the fourcc codec)
+        super().__init__(save_path, recording_FPS, recording_WH, encoder, enabled)
+    
+    # .................................................................................................................
+    
+    def release(self):
+        
+        if self._ffmpeg_process is None:
+            return
+        
+        # Closing the input tells ffmpeg that there are no more frames, then wait for it to finish the file
+        try:
+            self._ffmpeg_process.stdin.close()
+        except BrokenPipeError:
+            pass
+        return_code = self._ffmpeg_process.wait()
+        self._ffmpeg_process = None
+        self.end_time = dt.datetime.now()
+        
+        if return_code != 0:
+            raise IOError("ffmpeg exited with an error (code {}) while recording: {}".format(return_code,
+                                                                                              self.save_path))
+    
+    # .................................................................................................................
+    
+    def find_valid_codec(self, test_WH = None, candidate_codecs = None, num_test_frames = 30, cache_path = None):
+        
+        # The ffmpeg encoder is set directly (there's no ranking like with OpenCV codecs), so just check that
+        # ffmpeg is available & that a recording command can be built for the encoder settings
+        test_WH = self.frameWH if test_WH is None else test_WH
+        if test_WH is None:
+            raise AttributeError("Frame size not set!")
+        if shutil.which(self.ffmpeg_path) is None:
+            return None
+        
+        command_list = self.get_ffmpeg_command(frameWH = test_WH)
+        if not all(isinstance(each_arg, str) and len(each_arg) > 0 for each_arg in command_list):
+            return None
+        
+        return self.codec
+    
+    # .................................................................................................................
+    
+    def get_ffmpeg_command(self, is_color = True, frameWH = None):
+        
+        # Raw frames come in on stdin, exactly as they're stored in memory
+        frame_width, frame_height = self.frameWH if frameWH is None else frameWH
+        command_list = [self.ffmpeg_path, "-hide_banner", "-loglevel", "error", "-y",
+                        "-f", "rawvideo",
+                        "-pix_fmt", "bgr24" if is_color else "gray",
+                        "-s", "{}x{}".format(frame_width, frame_height),
+                        "-r", str(self.fps),
+                        "-i", "-"]
+        
+        # Encoder settings
+        command_list += ["-an", "-c:v", self.codec]
+        if self.preset is not None:
+            command_list += ["-preset", self.preset]
+        if self.crf is not None:
+            command_list += ["-crf", str(self.crf)]
+        if isinstance(self.threads, int) and self.threads > 0:
+            command_list += ["-threads", str(self.threads)]
+        if self.pixel_format is not None:
+            command_list += ["-pix_fmt", self.pixel_format]
+        
+        # Chroma subsampled formats (e.g. yuv420p) need even frame sizes, so pad odd sizes by a pixel
+        if (frame_width % 2 == 1) or (frame_height % 2 == 1):
+            command_list += ["-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2"]
+        
+        # Output, with the container guessed from the file extension unless given
+        command_list += self.extra_args
+        if self.container is not None:
+            command_list += ["-f", self.container]
+        command_list += [self.save_path]
+        
+        return command_list
+    
+    # .................................................................................................................
+    
+    def _write_frame(self, frame):
+        
+        # Pass the frame data to ffmpeg directly (no copy, unless the frame isn't stored contiguously)
+        try:
+            self._ffmpeg_process.stdin.write(memoryview(np.ascontiguousarray(frame)))
+        except BrokenPipeError:
+            return_code = self._ffmpeg_process.poll()
+            raise IOError("ffmpeg stopped unexpectedly (code {}) while recording: {}".format(return_code,
+                                                                                              self.save_path))
+    
+    # .................................................................................................................
+    
+    def _create_video_writer(self, is_color = True):
+        
+        # Handle disabled case
+        if self._disabled:
+            return
+        
+        # Make sure the save pathing is ok
+        os.makedirs(os.path.dirname(self.save_path), exist_ok = True)
+        
+        if self.frameWH is None:
+            raise AttributeError("Frame size not set!")
+        
+        if self.fps is None:
+            raise AttributeError("FPS not set")
+        
+        if shutil.which(self.ffmpeg_path) is None:
+            raise FileNotFoundError("Couldn't find ffmpeg for recording: {}".format(self.ffmpeg_path))
+        
+        # Start up ffmpeg, which does the encoding in it's own process as frames are piped in
+        self._ffmpeg_process = subprocess.Popen(self.get_ffmpeg_command(is_color), stdin = subprocess.PIPE)
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
 # =====================================================================================================================
 # =====================================================================================================================
 # =====================================================================================================================
 
 class Video_Reader:
     
-    def __init__(self, source_path):
+    def __init__(self, source_path, video_info = None, decoder_threads = None):
         
         # Check that source path is valid
         if not os.path.exists(source_path):
@@ -246,11 +570,25 @@ class Video_Reader:
         self.video_name = os.path.basename(source_path)
         self.video_name_only, self.video_extension = os.path.splitext(self.video_name)
         
-        # Open the video
-        self.video_object = cv2.VideoCapture(source_path)
+        # Open the video & get it's info, unless the info is already known (e.g. from a cache),
+        # in which case opening is put off until the video is actually needed
+        self.video_object = None
+        self._decoder_threads = decoder_threads
+        if video_info is None:
+            self.open()
+            self.video_info = self._get_video_info()
+        else:
+            self.video_info = self._build_info_dict(**video_info)
+        
+        # Allocate storage for seek planning (only used if a keyframe index is loaded)
+        self._seek_planner = None
         
-        # Get the video info
-        self.video_info = self._get_video_info()
+        # Keep track of hitting the end of the video, so we don't keep asking the decoder for frames that don't exist
+        self._reached_end = False
+        
+        # Hang on to the last frame read by index, so that repeated requests don't read (the wrong) frames again
+        self._last_read_index = None
+        self._last_read_frame = None
     
     # .................................................................................................................
     
@@ -275,6 +613,114 @@ class Video_Reader:
     
     # .................................................................................................................
     
+    def grab(self):
+        
+        # Advance to the next frame without converting/copying it out of the decoder
+        received_frame = self.video_object.grab()
+        request_break = (not received_frame)
+        
+        return request_break
+    
+    # .................................................................................................................
+    
+    def retrieve(self):
+        
+        # Get the most recently grabbed frame
+        received_frame, frame = self.video_object.retrieve()
+        request_break = (not received_frame)
+        
+        return request_break, frame
+    
+    # .................................................................................................................
+    
+    def skip(self, num_frames):
+        
+        # Grab (but don't retrieve) frames, so that frames we don't want are never converted into images
+        for k in range(num_frames):
+            request_break = self.grab()
+            if request_break:
+                return True
+        
+        return False
+    
+    # .................................................................................................................
+    
+    def read_at(self, frame_index):
+        
+        # Asking for the same frame again just gives back the frame we already have
+        if frame_index == self._last_read_index:
+            return False, self._last_read_frame
+        
+        # Going backwards means starting over from an earlier keyframe (or the start of the video)
+        current_index = self._capture_position()
+        if frame_index < current_index:
+            current_index = self._rewind(frame_index)
+        
+        # Don't bother trying to read anything once the video has run out of frames
+        elif self._reached_end:
+            return True, None
+        
+        # Jump to a keyframe near the target, if that is expected to be faster than grabbing every frame
+        elif self._seek_planner is not None:
+            keyframe_index = self._seek_planner.choose_seek(current_index, frame_index)
+            if keyframe_index is not None:
+                current_index = self._seek_to_keyframe(keyframe_index)
+        
+        # Skip up to the target frame, then retrieve only the target itself
+        num_to_skip = frame_index - current_index
+        t_start = perf_counter()
+        request_break = self.skip(num_to_skip)
+        if self._seek_planner is not None:
+            self._seek_planner.record_grabs(num_to_skip, perf_counter() - t_start)
+        if request_break:
+            self._reached_end = True
+            return request_break, None
+        
+        request_break = self.grab()
+        if request_break:
+            self._reached_end = True
+            return request_break, None
+        
+        request_break, frame = self.retrieve()
+        self._last_read_index = None if request_break else frame_index
+        self._last_read_frame = None if request_break else frame
+        
+        return request_break, frame
+    
+    # .................................................................................................................
+    
+    def enable_seek_planning(self, cache_folder = None, keyframe_indices = None):
+        
+        # Load (or build) the keyframe index for this video, which is needed to plan seeking
+        if keyframe_indices is None:
+            keyframe_indices = get_keyframe_index(self.video_source, cache_folder)
+        if keyframe_indices is None:
+            return False
+        
+        self._seek_planner = Seek_Planner(keyframe_indices)
+        
+        return True
+    
+    # .................................................................................................................
+    
+    def seek_planner(self):
+        return self._seek_planner
+    
+    # .................................................................................................................
+    
+    def reached_end(self):
+        return self._reached_end
+    
+    # .................................................................................................................
+    
+    def set_frame_count(self, frame_count):
+        
+        # Used to correct the (often wrong) frame count reported by the video file
+        self.video_info["frame_count"] = int(frame_count)
+        self.video_info["total_frames"] = int(frame_count)
+    
+    # .................................................................................................................
+    
     def release(self):
         
         try:
@@ -289,6 +735,14 @@ class Video_Reader:
         
     # .................................................................................................................
         
+    def open(self):
+        
+        # Only open the video if it isn't already open
+        if not self.is_open():
+            self.video_object = self._open_capture()
+    
+    # .................................................................................................................
+        
     def reopen(self):
         
         # Close the video if it is currently open
@@ -296,7 +750,43 @@ class Video_Reader:
             self.close()
             
         # Re-open the video
-        self.video_object = cv2.VideoCapture(self.video_source)
+        self.video_object = self._open_capture()
+        self._reached_end = False
+    
+    # .................................................................................................................
+    
+    def set_decoder_threads(self, num_threads):
+        
+        # The decoder thread count can only be set when opening. Videos that are already open keep their count,
+        # rather than being re-opened, so that each video is only opened once
+        if self.is_open():
+            return False
+        self._decoder_threads = num_threads
+        
+        return True
+    
+    # .................................................................................................................
+    
+    def decoder_threads(self):
+        # Thread count given to the decoder (None if the decoder picks it's own)
+        return self._decoder_threads
+    
+    # .................................................................................................................
+    
+    def _open_capture(self):
+        
+        # Let the decoder pick it's own thread count, unless one is given
+        if self._decoder_threads is None:
+            return cv2.VideoCapture(self.video_source)
+        
+        # Older versions of OpenCV don't support open parameters (or setting the decoder thread count)
+        try:
+            return cv2.VideoCapture(self.video_source, cv2.CAP_ANY,
+                                    [cv2.CAP_PROP_N_THREADS, int(self._decoder_threads)])
+        except (cv2.error, TypeError, AttributeError):
+            self._decoder_threads = None
+        
+        return cv2.VideoCapture(self.video_source)
     
     # .................................................................................................................
     
@@ -305,6 +795,45 @@ class Video_Reader:
         
     # .................................................................................................................
     
+    def _rewind(self, frame_index):
+        
+        # Jump back to the nearest keyframe before the target, if they're known. Otherwise start over from the
+        # beginning of the video, since seeking to arbitrary frames isn't reliable on every video
+        # (note: the base class reopen is used, since this can be called from a threaded reader's own thread)
+        self._reached_end = False
+        keyframe_index = None
+        if self._seek_planner is not None and self._seek_planner.is_enabled():
+            keyframe_index = self._seek_planner.nearest_keyframe(frame_index)
+        if keyframe_index is not None:
+            return self._seek_to_keyframe(keyframe_index)
+        
+        Video_Reader.reopen(self)
+        
+        return self._capture_position()
+    
+    # .................................................................................................................
+    
+    def _seek_to_keyframe(self, keyframe_index):
+        
+        # Jump to the target keyframe and record how long it took
+        t_start = perf_counter()
+        self.set_current_frame(keyframe_index)
+        landed_index = self._capture_position()
+        self._seek_planner.record_seek(perf_counter() - t_start)
+        
+        # If the seek wasn't exact, stop seeking on this video, since frame positions can't be trusted afterwards
+        if landed_index != keyframe_index:
+            print("")
+            print("Inaccurate seeking on video: {}".format(self.video_name))
+            print("  Falling back to sequential reading")
+            self._seek_planner.disable()
+            Video_Reader.reopen(self)
+            landed_index = self._capture_position()
+        
+        return landed_index
+    
+    # .................................................................................................................
+    
     def set_current_progress(self, progress_fraction):
         frame_index = int(round((self.info("total_frames") - 1) * progress_fraction))
         self.video_object.set(cv2.CAP_PROP_POS_FRAMES, frame_index)
@@ -312,7 +841,7 @@ class Video_Reader:
     # .................................................................................................................
     
     def current_frame(self):
-        return int(self.video_object.get(cv2.CAP_PROP_POS_FRAMES))
+        return self._capture_position()
     
     # .................................................................................................................
     
@@ -339,6 +868,11 @@ class Video_Reader:
     
     # .................................................................................................................
     
+    def _capture_position(self):
+        return int(self.video_object.get(cv2.CAP_PROP_POS_FRAMES))
+    
+    # .................................................................................................................
+    
     def _get_naming(self):
         pass
     
@@ -355,6 +889,18 @@ class Video_Reader:
         framerate = self.video_object.get(cv2.CAP_PROP_FPS)
         vid_width = int(self.video_object.get(cv2.CAP_PROP_FRAME_WIDTH))
         vid_height = int(self.video_object.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        codec = fourcc_to_string(self.video_object.get(cv2.CAP_PROP_FOURCC))
+        
+        return self._build_info_dict(total_frames, framerate, vid_width, vid_height, codec)
+    
+    # .................................................................................................................
+    
+    def _build_info_dict(self, frame_count, fps, width, height, codec = None, **extra_info):
+        
+        total_frames = int(frame_count)
+        framerate = fps
+        vid_width = int(width)
+        vid_height = int(height)
         vidWH = (vid_width, vid_height)
         vidHWC = (vid_height, vid_width, 3)
         
@@ -369,6 +915,7 @@ class Video_Reader:
                      "vidWH": vidWH,
                      "WH": vidWH,
                      "vidHWC": vidHWC,
+                     "codec": codec,
                      "name": self.video_name,
                      "source": self.video_source}
         
@@ -493,13 +1040,209 @@ class Read_Video:
 # =====================================================================================================================
 # =====================================================================================================================
         
-'''
-class Read_Video_Threaded:
+class Read_Video_Threaded(Video_Reader):
     
-    def __init__(self, video_source):
+    # .................................................................................................................
+    
+    def __init__(self, source_path, frame_index_list = None, queue_size = 8, video_info = None, decoder_threads = None):
+        
+        # Open the video like a regular reader
+        super().__init__(source_path, video_info, decoder_threads)
+        
+        # Store threading settings
+        self.queue_size = queue_size
+        self._frame_queue = None
+        self._read_thread = None
+        self._stop_event = threading.Event()
+        
+        # Allocate storage for the list of frames the background thread should deliver
+        self._frame_plan = None
+        self._last_delivered_index = -1
+        self._last_decode_sec = 0.0
+        self._finished = False
+        if frame_index_list is not None:
+            self.set_frame_plan(frame_index_list)
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        out_string = [super().__repr__()]
+        out_string += ["Threaded, queue size: {}".format(self.queue_size)]
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def set_frame_plan(self, frame_index_list):
         
-        pass
-'''
+        # Can't change plans while the background thread is reading, so stop it first
+        self._stop_reading()
+        self._frame_plan = [int(each_index) for each_index in frame_index_list]
+        self._last_delivered_index = -1
+        self._finished = False
+    
+    # .................................................................................................................
+    
+    def start(self):
+        
+        # Don't start multiple threads
+        if self._read_thread is not None:
+            return
+        
+        if self._frame_plan is None:
+            raise AttributeError("Frame plan not set!")
+        
+        # Make sure the video is open before the reading thread takes over
+        self.open()
+        
+        # Start up the background reading thread
+        self._stop_event.clear()
+        self._frame_queue = queue.Queue(maxsize = self.queue_size)
+        self._read_thread = threading.Thread(target = self._read_loop, daemon = True)
+        self._read_thread.start()
+    
+    # .................................................................................................................
+    
+    def read(self):
+        
+        # Return the next frame from the plan, whatever index it is
+        frame_index, request_break, frame = self._get_next()
+        
+        return request_break, frame
+    
+    # .................................................................................................................
+    
+    def read_at(self, frame_index):
+        
+        # Pull frames off the queue until we get the requested index
+        # (frames should be requested in the same order as the plan, so this normally returns immediately)
+        self._last_decode_sec = 0.0
+        while True:
+            delivered_index, request_break, frame = self._get_next()
+            if request_break or delivered_index >= frame_index:
+                return request_break, frame
+    
+    # .................................................................................................................
+    
+    def last_decode_sec(self):
+        # Time the background thread spent reading the frame(s) handed out by the last read_at call
+        # (the time spent in read_at itself is only the wait on the queue)
+        return self._last_decode_sec
+    
+    # .................................................................................................................
+    
+    def current_frame(self):
+        # Report the position of the delivered frames, not the (further ahead) position of the background reader
+        return self._last_delivered_index + 1
+    
+    # .................................................................................................................
+    
+    def reached_end(self):
+        # The background reader stops on the first bad frame, so we're done once it's out of frames to give
+        return self._finished
+    
+    # .................................................................................................................
+    
+    def queue_depth(self):
+        return 0 if self._frame_queue is None else self._frame_queue.qsize()
+    
+    # .................................................................................................................
+    
+    def release(self):
+        self._stop_reading()
+        super().release()
+    
+    # .................................................................................................................
+    
+    def reopen(self):
+        
+        # Stop reading and reset the plan so that reading starts over once the video is re-opened
+        self._stop_reading()
+        self._last_delivered_index = -1
+        self._finished = False
+        super().reopen()
+    
+    # .................................................................................................................
+    
+    def _get_next(self):
+        
+        # Nothing left to give if the reader has already hit the end of the plan
+        if self._finished:
+            return self._last_delivered_index, True, None
+        
+        # Make sure we're actually reading before trying to take frames off the queue
+        if self._read_thread is None:
+            self.start()
+        
+        # Wait for the next frame from the reading thread. A 'None' entry indicates the thread has finished
+        next_item = self._frame_queue.get()
+        if next_item is None:
+            self._finished = True
+            return self._last_delivered_index, True, None
+        
+        delivered_index, request_break, frame, decode_sec = next_item
+        self._last_delivered_index = delivered_index
+        self._last_decode_sec += decode_sec
+        
+        return delivered_index, request_break, frame
+    
+    # .................................................................................................................
+    
+    def _read_loop(self):
+        
+        prev_index = None
+        prev_frame = None
+        for each_index in self._frame_plan:
+            
+            # Repeated indices (when stretching short videos) re-use the previous frame instead of reading again
+            t_start = perf_counter()
+            if each_index == prev_index:
+                request_break, new_frame = False, prev_frame
+            else:
+                request_break, new_frame = Video_Reader.read_at(self, each_index)
+            decode_sec = perf_counter() - t_start
+            
+            # Hand off the frame (and read timing) to the main thread, giving up if we're told to stop
+            frame_delivered = self._put_frame((each_index, request_break, new_frame, decode_sec))
+            if (not frame_delivered) or request_break:
+                break
+            
+            prev_index = each_index
+            prev_frame = new_frame
+        
+        # Signal that there are no more frames coming
+        self._put_frame(None)
+    
+    # .................................................................................................................
+    
+    def _put_frame(self, queue_item):
+        
+        # Block while the queue is full, but keep checking for a stop signal so we can't get stuck
+        while not self._stop_event.is_set():
+            try:
+                self._frame_queue.put(queue_item, timeout = 0.1)
+                return True
+            except queue.Full:
+                pass
+        
+        return False
+    
+    # .................................................................................................................
+    
+    def _stop_reading(self):
+        
+        # Nothing to do if the thread isn't running
+        if self._read_thread is None:
+            return
+        
+        # Signal the thread to stop (it checks for this while waiting on the queue) and wait for it to finish
+        self._stop_event.set()
+        self._read_thread.join()
+        self._read_thread = None
+        self._frame_queue = None
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
 
     
 # =====================================================================================================================
@@ -511,13 +1254,127 @@ class Read_Video_Threaded:
 #%% Define functions
 
 # .....................................................................................................................
+
+def fourcc_to_string(fourcc_value):
+    
+    # Convert the numeric fourcc reported by OpenCV into it's 4-character code
+    fourcc_int = int(fourcc_value)
+    if fourcc_int <= 0:
+        return None
+    
+    return "".join([chr((fourcc_int >> (8 * k)) & 0xFF) for k in range(4)])
+
+# .....................................................................................................................
+
+def get_timelapse_plan(num_frames, timelapse_factor = 1, start_count = 0):
+    
+    # Get a true/false listing of which frames are kept when only recording every n-th frame
+    frame_counts = np.arange(start_count, start_count + num_frames)
+    
+    return (frame_counts % max(1, int(timelapse_factor))) == 0
+
+# .....................................................................................................................
+
+def rank_codecs(frameWH, fps = 30.0, file_extension = ".avi", candidate_codecs = None, num_test_frames = 30,
+                cache_path = None):
+    
+    # Use the usual codecs for the given file type, if candidates aren't given
+    if candidate_codecs is None:
+        candidate_codecs = CODEC_CANDIDATES_LUT.get(file_extension.lower(), DEFAULT_CODEC_CANDIDATES)
+    
+    # Re-use earlier results from this machine, since probing takes a while at large frame sizes
+    frame_width, frame_height = frameWH
+    cache_key = "{}|opencv-{}|{}|{}x{}|{}".format(socket.gethostname(), cv2.__version__, file_extension,
+                                                  frame_width, frame_height, ",".join(candidate_codecs))
+    if cache_path is not None:
+        try:
+            cached_data = loadHistoryFile(cache_path)
+        except Exception:
+            cached_data = None
+        cached_ranking = None if cached_data is None else cached_data.get(cache_key, None)
+        if cached_ranking is not None:
+            return cached_ranking
+    
+    # Make a few (distinct) frames with both smooth & detailed content, so encoders can't take shortcuts
+    random_generator = np.random.default_rng(0)
+    smooth_frame = cv2.resize(random_generator.integers(0, 256, (9, 16, 3), dtype = np.uint8), dsize = frameWH)
+    detail_frame = random_generator.integers(0, 32, (frame_height, frame_width, 3), dtype = np.uint8)
+    base_frame = cv2.add(smooth_frame, detail_frame)
+    test_frames = [np.roll(base_frame, 8 * k, axis = 1) for k in range(min(8, num_test_frames))]
+    
+    print("")
+    print("Probing {} codecs for {} recording ({} x {})...".format(len(candidate_codecs), file_extension,
+                                                                    frame_width, frame_height))
+    
+    # Record a short clip with each codec, timing the encoding and checking that the result is readable
+    test_folder = tempfile.mkdtemp(prefix = "codec_probe_")
+    ranking_list = []
+    for each_codec in candidate_codecs:
         
+        test_path = os.path.join(test_folder, "{}{}".format(each_codec, file_extension))
+        codec_result = {"codec": each_codec, "works": False, "fps": 0.0, "bytes_per_frame": None}
+        
+        try:
+            t_start = perf_counter()
+            video_writer = cv2.VideoWriter(test_path, cv2.VideoWriter_fourcc(*each_codec), fps, frameWH)
+            if not video_writer.isOpened():
+                video_writer.release()
+                ranking_list.append(codec_result)
+                continue
+            for k in range(num_test_frames):
+                video_writer.write(test_frames[k % len(test_frames)])
+            video_writer.release()
+            t_end = perf_counter()
+        except cv2.error:
+            ranking_list.append(codec_result)
+            continue
+        
+        # Some codecs 'open' fine but write nothing (or unreadable files), so check that every frame can be read
+        capture = cv2.VideoCapture(test_path)
+        num_frames_read = 0
+        while True:
+            received_frame, _ = capture.read()
+            if not received_frame:
+                break
+            num_frames_read += 1
+        capture.release()
+        
+        codec_result["works"] = (num_frames_read == num_test_frames)
+        codec_result["fps"] = num_test_frames / max(t_end - t_start, 1E-6)
+        codec_result["bytes_per_frame"] = os.path.getsize(test_path) / num_test_frames
+        ranking_list.append(codec_result)
+    
+    shutil.rmtree(test_folder, ignore_errors = True)
+    
+    # Fastest working codecs first
+    ranking_list = sorted(ranking_list, key = lambda result: (result["works"], result["fps"]), reverse = True)
+    
+    # Save results for next time
+    if cache_path is not None:
+        saveHistoryFile(cache_path, {cache_key: ranking_list})
+    
+    return ranking_list
+
+# .....................................................................................................................
+
+       
 # .....................................................................................................................
         
 
 # .....................................................................................................................
         
 
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Globals
+
+CODEC_CANDIDATES_LUT = {".avi": ("X264", "H264", "XVID", "DIVX", "MJPG", "mp4v"),
+                        ".mp4": ("avc1", "H264", "X264", "mp4v"),
+                        ".mkv": ("X264", "H264", "XVID", "MJPG", "mp4v"),
+                        ".mov": ("avc1", "H264", "mp4v", "MJPG")}
+
+DEFAULT_CODEC_CANDIDATES = ("X264", "H264", "avc1", "XVID", "MJPG", "mp4v")
+
+
 # ---------------------------------------------------------------------------------------------------------------------
 #%% Demo
         
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:02:14 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import json
+import socket
+import numpy as np
+import datetime as dt
+
+from time import time
+
+from local.eolib.utils.files import write_file_atomic
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Render_Job:
+    
+    # .................................................................................................................
+    
+    def __init__(self, job_folder):
+        
+        # Store pathing
+        self.job_folder = os.path.abspath(job_folder)
+        self.manifest_path = os.path.join(self.job_folder, MANIFEST_NAME)
+        self.frame_indices_path = os.path.join(self.job_folder, FRAME_INDICES_NAME)
+        self.locks_folder = os.path.join(self.job_folder, "locks")
+        self.done_folder = os.path.join(self.job_folder, "done")
+        self.units_folder = os.path.join(self.job_folder, "units")
+        
+        # Load the job description
+        with open(self.manifest_path, "r") as in_file:
+            self.manifest = json.load(in_file)
+        self.units = self.manifest["units"]
+        
+        # Older jobs are missing settings (e.g. the encoder) that every worker needs to agree on
+        if self.manifest.get("version", 0) < MANIFEST_VERSION:
+            raise ValueError("Render job was made by an older version (v{}, need v{}), please re-create it: {}".format(
+                self.manifest.get("version", 0), MANIFEST_VERSION, self.job_folder))
+        self.worker_id = get_worker_id()
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        status_dict = self.unit_status()
+        out_string = ["Render job: {}".format(self.job_folder)]
+        out_string += ["  Output: {}".format(self.manifest["output"]["path"])]
+        out_string += ["  Units: {} ({} done, {} claimed)".format(len(self.units),
+                                                                  status_dict["done"],
+                                                                  status_dict["claimed"])]
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def load_frame_indices(self):
+        
+        # Frame indices (and keyframes) are stored separately from the manifest, since they can be very large
+        with np.load(self.frame_indices_path) as index_data:
+            num_videos = len(self.manifest["inputs"])
+            frame_index_lists = [index_data["frames_{}".format(k)] for k in range(num_videos)]
+            keyframe_lists = [index_data["keyframes_{}".format(k)] if "keyframes_{}".format(k) in index_data else None
+                              for k in range(num_videos)]
+        
+        return frame_index_lists, keyframe_lists
+    
+    # .................................................................................................................
+    
+    def claim_next_unit(self, stale_lock_sec = 600):
+        
+        # Find the first unit that isn't done and isn't being worked on by someone else
+        for each_unit in self.units:
+            if self.is_unit_done(each_unit):
+                continue
+            if not self._try_lock(self._lock_path(each_unit), stale_lock_sec):
+                continue
+            
+            # Another worker may have finished the unit (and released it's lock) just before we locked it
+            if self.is_unit_done(each_unit):
+                self.release_unit(each_unit)
+                continue
+            
+            return each_unit
+        
+        return None
+    
+    # .................................................................................................................
+    
+    def heartbeat(self, unit):
+        
+        # Update the lock file timing, so other workers know this unit is still being worked on
+        try:
+            os.utime(self._lock_path(unit))
+        except OSError:
+            pass
+    
+    # .................................................................................................................
+    
+    def get_unit_path(self, unit):
+        return os.path.join(self.units_folder, unit["file_name"])
+    
+    # .................................................................................................................
+    
+    def get_unit_temp_path(self, unit):
+        
+        # Each worker renders into it's own file, so a stale worker can't clobber the file of a re-claimed unit
+        name_only, extension = os.path.splitext(unit["file_name"])
+        temp_name = "{}.{}.tmp{}".format(name_only, self.worker_id, extension)
+        
+        return os.path.join(self.units_folder, temp_name)
+    
+    # .................................................................................................................
+    
+    def complete_unit(self, unit, rendered_path):
+        
+        # Move the rendered file into place, then mark the unit as done (both are atomic on the same filesystem)
+        os.replace(rendered_path, self.get_unit_path(unit))
+        done_info = {"worker": self.worker_id, "finished": dt.datetime.now().isoformat()}
+        write_file_atomic(self._done_path(unit), json.dumps(done_info))
+        
+        # Lock is no longer needed
+        try:
+            os.remove(self._lock_path(unit))
+        except OSError:
+            pass
+    
+    # .................................................................................................................
+    
+    def release_unit(self, unit):
+        
+        # Give up on a unit (e.g. on errors), so that another worker can take it
+        try:
+            os.remove(self._lock_path(unit))
+        except OSError:
+            pass
+    
+    # .................................................................................................................
+    
+    def is_unit_done(self, unit):
+        return os.path.exists(self._done_path(unit))
+    
+    # .................................................................................................................
+    
+    def all_units_done(self):
+        return all(self.is_unit_done(each_unit) for each_unit in self.units)
+    
+    # .................................................................................................................
+    
+    def unit_status(self):
+        
+        num_done = sum(1 for each_unit in self.units if self.is_unit_done(each_unit))
+        num_claimed = sum(1 for each_unit in self.units
+                          if os.path.exists(self._lock_path(each_unit)) and not self.is_unit_done(each_unit))
+        
+        return {"done": num_done, "claimed": num_claimed, "total": len(self.units)}
+    
+    # .................................................................................................................
+    
+    def claim_merge(self, stale_lock_sec = 600):
+        
+        # Only one worker should do the final merge, and only once everything has been rendered
+        if self.is_merged() or not self.all_units_done():
+            return False
+        
+        return self._try_lock(os.path.join(self.locks_folder, "merge.lock"), stale_lock_sec)
+    
+    # .................................................................................................................
+    
+    def mark_merged(self):
+        merge_info = {"worker": self.worker_id, "finished": dt.datetime.now().isoformat()}
+        write_file_atomic(os.path.join(self.done_folder, "merge.done"), json.dumps(merge_info))
+    
+    # .................................................................................................................
+    
+    def is_merged(self):
+        return os.path.exists(os.path.join(self.done_folder, "merge.done"))
+    
+    # .................................................................................................................
+    
+    def _lock_path(self, unit):
+        return os.path.join(self.locks_folder, "unit_{:04d}.lock".format(unit["index"]))
+    
+    # .................................................................................................................
+    
+    def _done_path(self, unit):
+        return os.path.join(self.done_folder, "unit_{:04d}.done".format(unit["index"]))
+    
+    # .................................................................................................................
+    
+    def _try_lock(self, lock_path, stale_lock_sec):
+        
+        # Break old locks left behind by workers that died (locks are touched regularly while working)
+        if self._is_lock_stale(lock_path, stale_lock_sec):
+            self._break_stale_lock(lock_path, stale_lock_sec)
+        
+        # Creating the lock file is atomic (and fails if the file already exists), so only one worker can claim it
+        try:
+            lock_file = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        
+        lock_info = {"worker": self.worker_id, "claimed": dt.datetime.now().isoformat()}
+        os.write(lock_file, json.dumps(lock_info).encode("utf-8"))
+        os.close(lock_file)
+        
+        return True
+    
+    # .................................................................................................................
+    
+    def _is_lock_stale(self, lock_path, stale_lock_sec):
+        
+        try:
+            lock_age_sec = time() - os.path.getmtime(lock_path)
+        except OSError:
+            return False
+        
+        return lock_age_sec > stale_lock_sec
+    
+    # .................................................................................................................
+    
+    def _break_stale_lock(self, lock_path, stale_lock_sec):
+        
+        # Move the lock out of the way. Renaming is atomic, but another worker may have broken the same stale lock
+        # (and claimed the unit) since we checked it, in which case we've just moved their fresh lock!
+        stale_path = "{}.stale.{}".format(lock_path, self.worker_id)
+        try:
+            os.rename(lock_path, stale_path)
+        except OSError:
+            return
+        
+        # Put fresh locks back (renaming keeps the modification time). Linking fails if the lock was re-claimed
+        # in the meantime, rather than replacing it, though not every filesystem supports links
+        if not self._is_lock_stale(stale_path, stale_lock_sec):
+            try:
+                os.link(stale_path, lock_path)
+            except FileExistsError:
+                pass
+            except OSError:
+                os.replace(stale_path, lock_path)
+                return
+        
+        try:
+            os.remove(stale_path)
+        except OSError:
+            pass
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def create_render_job(job_folder, input_list, frame_index_lists, keyframe_lists, layout_dict, output_dict,
+                      frames_per_unit = 1800):
+    
+    # Make sure we're not overwriting an existing job
+    job_folder = os.path.abspath(job_folder)
+    if os.path.exists(os.path.join(job_folder, MANIFEST_NAME)):
+        raise FileExistsError("Render job already exists: {}".format(job_folder))
+    
+    # Create the folder structure used to keep track of work
+    for each_subfolder in ["locks", "done", "units"]:
+        os.makedirs(os.path.join(job_folder, each_subfolder), exist_ok = True)
+    
+    # Save frame indices (and keyframes, so workers don't each need to scan for them)
+    index_data = {"frames_{}".format(k): np.int32(each_list) for k, each_list in enumerate(frame_index_lists)}
+    for k, each_keyframe_list in enumerate(keyframe_lists):
+        if each_keyframe_list is not None:
+            index_data["keyframes_{}".format(k)] = np.uint32(each_keyframe_list)
+    with open(os.path.join(job_folder, FRAME_INDICES_NAME), "wb") as out_file:
+        np.savez_compressed(out_file, **index_data)
+    
+    # Split the output frames into units of work
+    num_output_frames = len(frame_index_lists[0])
+    output_extension = os.path.splitext(output_dict["path"])[1]
+    unit_list = []
+    for unit_idx, start_idx in enumerate(range(0, num_output_frames, frames_per_unit)):
+        end_idx = min(num_output_frames, start_idx + frames_per_unit)
+        unit_list.append({"index": unit_idx,
+                          "start": start_idx,
+                          "end": end_idx,
+                          "file_name": "unit_{:04d}{}".format(unit_idx, output_extension)})
+    
+    # Save the manifest last, since workers treat it as the sign that the job is ready
+    manifest = {"version": MANIFEST_VERSION,
+                "created": dt.datetime.now().isoformat(),
+                "created_by": get_worker_id(),
+                "inputs": input_list,
+                "layout": layout_dict,
+                "output": {**output_dict, "frame_count": num_output_frames},
+                "frame_indices_file": FRAME_INDICES_NAME,
+                "units": unit_list}
+    write_file_atomic(os.path.join(job_folder, MANIFEST_NAME), json.dumps(manifest, indent = 2))
+    
+    return Render_Job(job_folder)
+
+# .....................................................................................................................
+
+def get_worker_id():
+    # Identify workers by machine and process, since several workers may run on each machine
+    return "{}-{}".format(socket.gethostname(), os.getpid())
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Globals
+
+MANIFEST_VERSION = 2
+MANIFEST_NAME = "manifest.json"
+FRAME_INDICES_NAME = "frame_indices.npz"
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
+
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:08:26 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import cv2
+import numpy as np
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Tile_Resizer:
+    
+    # .................................................................................................................
+    
+    def __init__(self, policy = "auto"):
+        
+        # Make sure we got a policy we know how to handle
+        if policy not in RESIZE_POLICIES:
+            raise ValueError("Unknown resize policy: {} (expecting one of {})".format(policy, RESIZE_POLICIES))
+        self.policy = policy
+        
+        # Store buffers for pyramid downscaling, so they aren't re-allocated on every frame
+        self._pyramid_buffers = {}
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        return "Tile resizer ({})".format(self.policy)
+    
+    # .................................................................................................................
+    
+    def resize_into(self, frame, dst_view):
+        
+        # Figure out the sizing, so we can decide how to resize
+        dst_height, dst_width = dst_view.shape[0:2]
+        dstWH = (dst_width, dst_height)
+        policy = self.choose_policy(frame.shape[1], frame.shape[0], dst_width, dst_height)
+        
+        # Halve the frame (with smoothing) until it's within 2x of the target size, then finish with a linear resize
+        if policy == "pyramid":
+            frame = self._pyramid_downscale(frame, dst_width, dst_height)
+            policy = "linear"
+        
+        cv2.resize(frame, dsize = dstWH, dst = dst_view, interpolation = INTERPOLATION_LUT[policy])
+        
+        return dst_view
+    
+    # .................................................................................................................
+    
+    def choose_policy(self, src_width, src_height, dst_width, dst_height):
+        
+        # Use the given policy, unless we're picking automatically
+        if self.policy != "auto":
+            return self.policy
+        
+        # Smooth interpolation for upscaling
+        scale_factor = min(dst_width / src_width, dst_height / src_height)
+        if scale_factor >= 1.0:
+            return "linear"
+        
+        # Area averaging for shrinking (avoids aliasing). OpenCV has a fast path for whole-number reductions,
+        # otherwise area resizing gets slow for big reductions, where pyramid steps are much faster
+        is_whole_reduction = (src_width % dst_width == 0) and (src_height % dst_height == 0)
+        if is_whole_reduction or scale_factor > 0.5:
+            return "area"
+        
+        return "pyramid"
+    
+    # .................................................................................................................
+    
+    def _pyramid_downscale(self, frame, dst_width, dst_height):
+        
+        # Halve the frame while it's still more than twice the size of the target
+        src_height, src_width = frame.shape[0:2]
+        while (src_width >= 2 * dst_width) and (src_height >= 2 * dst_height):
+            
+            # Get (or allocate) a buffer for the next pyramid level
+            half_shape = ((src_height + 1) // 2, (src_width + 1) // 2) + frame.shape[2:]
+            half_buffer = self._pyramid_buffers.get(half_shape, None)
+            if half_buffer is None:
+                half_buffer = np.empty(half_shape, dtype = frame.dtype)
+                self._pyramid_buffers[half_shape] = half_buffer
+            
+            frame = cv2.pyrDown(frame, dst = half_buffer)
+            src_height, src_width = frame.shape[0:2]
+        
+        return frame
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def resize_frame(frame, dsize, policy = "auto"):
+    
+    # Convenience function for one-off resizing (doesn't re-use pyramid buffers)
+    dst_frame = np.empty((dsize[1], dsize[0]) + frame.shape[2:], dtype = frame.dtype)
+    
+    return Tile_Resizer(policy).resize_into(frame, dst_frame)
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Globals
+
+RESIZE_POLICIES = ("auto", "nearest", "linear", "area", "pyramid")
+
+INTERPOLATION_LUT = {"nearest": cv2.INTER_NEAREST,
+                     "linear": cv2.INTER_LINEAR,
+                     "area": cv2.INTER_AREA}
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
+
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:14:51 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import cv2
+import numpy as np
+
+from local.eolib.video.read_write import Video_Recorder, fourcc_to_string
+from local.eolib.video.indexing import open_raw_capture
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def get_segment_ranges(num_frames, num_segments):
+    
+    # Split frame indices into contiguous (start, end) ranges, with the end index being exclusive
+    num_segments = max(1, min(num_frames, num_segments))
+    segment_indices = np.array_split(np.arange(num_frames), num_segments)
+    
+    return [(int(each_segment[0]), int(each_segment[-1]) + 1) for each_segment in segment_indices]
+
+# .....................................................................................................................
+
+def get_segment_paths(output_path, num_segments):
+    
+    # Segments are stored in a folder beside the final output, using the same file type
+    output_name_only, output_extension = os.path.splitext(os.path.basename(output_path))
+    segment_folder = os.path.join(os.path.dirname(output_path), "{}.segments".format(output_name_only))
+    segment_paths = [os.path.join(segment_folder, "segment_{:03d}{}".format(k, output_extension))
+                     for k in range(num_segments)]
+    
+    return segment_folder, segment_paths
+
+# .....................................................................................................................
+
+def get_video_properties(video_path):
+    
+    capture = cv2.VideoCapture(video_path)
+    video_properties = {"fps": capture.get(cv2.CAP_PROP_FPS),
+                        "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+                        "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+                        "frame_count": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+                        "codec": fourcc_to_string(capture.get(cv2.CAP_PROP_FOURCC))}
+    capture.release()
+    
+    return video_properties
+
+# .....................................................................................................................
+
+def can_join_lossless():
+    
+    # Raw (packet) reading & writing are needed to join segments without re-encoding (newer versions of OpenCV)
+    required_props = ["VIDEOWRITER_PROP_RAW_VIDEO", "VIDEOWRITER_PROP_KEY_FLAG", "CAP_PROP_LRF_HAS_KEY_FRAME"]
+    return all(hasattr(cv2, each_prop) for each_prop in required_props)
+
+# .....................................................................................................................
+
+def join_segments(segment_path_list, output_path, expected_frame_count = None):
+    
+    # Try copying the encoded data directly, and only fall back to re-encoding if that doesn't work
+    join_ok = join_segments_lossless(segment_path_list, output_path, expected_frame_count)
+    if join_ok:
+        return "lossless"
+    
+    print("")
+    print("Couldn't join segments without re-encoding, re-encoding instead...")
+    join_segments_reencode(segment_path_list, output_path)
+    
+    return "re-encoded"
+
+# .....................................................................................................................
+
+def join_segments_lossless(segment_path_list, output_path, expected_frame_count = None):
+    
+    # Raw (packet) writing is only available on newer versions of OpenCV, using the FFmpeg backend
+    if not can_join_lossless():
+        return False
+    raw_video_prop = cv2.VIDEOWRITER_PROP_RAW_VIDEO
+    
+    # Set up a writer which takes encoded packets as-is (i.e. no re-encoding)
+    video_properties = get_video_properties(segment_path_list[0])
+    frameWH = (video_properties["width"], video_properties["height"])
+    fourcc = cv2.VideoWriter_fourcc(*video_properties["codec"])
+    try:
+        video_writer = cv2.VideoWriter(output_path, cv2.CAP_FFMPEG, fourcc, video_properties["fps"], frameWH,
+                                       [raw_video_prop, 1])
+    except cv2.error:
+        return False
+    if not video_writer.isOpened():
+        video_writer.release()
+        return False
+    
+    # Copy every packet from every segment into the output
+    num_packets = 0
+    for each_path in segment_path_list:
+        
+        raw_capture = open_raw_capture(each_path)
+        if raw_capture is None:
+            video_writer.release()
+            return False
+        
+        # Codec headers (e.g. for mp4v) are stored separately in each segment, so they need to be added
+        # back into the stream at keyframes. Only headers using start codes can be added in-band like this
+        header_bytes = get_inband_header(raw_capture)
+        
+        while True:
+            received_packet, packet = raw_capture.read()
+            if not received_packet:
+                break
+            
+            is_keyframe = (raw_capture.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0)
+            if is_keyframe and header_bytes is not None:
+                packet = np.concatenate((header_bytes, packet.reshape(1, -1)), axis = 1)
+            
+            video_writer.set(cv2.VIDEOWRITER_PROP_KEY_FLAG, int(is_keyframe))
+            video_writer.write(packet)
+            num_packets += 1
+        
+        raw_capture.release()
+    
+    video_writer.release()
+    
+    # Make sure the joined video is actually readable (some container/codec combinations can't be copied)
+    return check_joined_video(output_path, num_packets if expected_frame_count is None else expected_frame_count)
+
+# .....................................................................................................................
+
+def get_inband_header(raw_capture):
+    
+    # Get the codec 'extra data' for the stream, if there is any
+    extradata_prop = getattr(cv2, "CAP_PROP_CODEC_EXTRADATA_INDEX", None)
+    if extradata_prop is None:
+        return None
+    try:
+        received_extradata, extradata = raw_capture.retrieve(flag = int(raw_capture.get(extradata_prop)))
+    except cv2.error:
+        return None
+    if (not received_extradata) or (extradata is None) or (extradata.size == 0):
+        return None
+    
+    # Only headers that start with a start code can be placed in the stream itself
+    header_bytes = extradata.reshape(1, -1)
+    has_start_code = (header_bytes[0, 0:3].tolist() == [0, 0, 1]) or (header_bytes[0, 0:4].tolist() == [0, 0, 0, 1])
+    
+    return header_bytes if has_start_code else None
+
+# .....................................................................................................................
+
+def check_joined_video(video_path, expected_frame_count):
+    
+    # Check that the frame count is correct and that the first frame can be decoded
+    capture = cv2.VideoCapture(video_path)
+    frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    received_frame, _ = capture.read()
+    capture.release()
+    
+    return received_frame and (frame_count == expected_frame_count)
+
+# .....................................................................................................................
+
+def join_segments_reencode(segment_path_list, output_path):
+    
+    # Decode every segment and record the frames into a single video
+    video_properties = get_video_properties(segment_path_list[0])
+    frameWH = (video_properties["width"], video_properties["height"])
+    video_out = Video_Recorder(output_path, video_properties["fps"], frameWH, codec = video_properties["codec"])
+    for each_path in segment_path_list:
+        capture = cv2.VideoCapture(each_path)
+        while True:
+            received_frame, frame = capture.read()
+            if not received_frame:
+                break
+            video_out.write(frame, auto_resize = False)
+        capture.release()
+    video_out.close()
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
+
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:41:05 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import numpy as np
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def plan_thread_budget(streamWH_list, outputWH, total_threads = None, encode_cost = None, resize_cost = None):
+    
+    # Use every cpu unless told otherwise
+    total_threads = os.cpu_count() if total_threads is None else total_threads
+    total_threads = max(1, int(total_threads))
+    encode_cost = ENCODE_COST_FACTOR if encode_cost is None else encode_cost
+    resize_cost = RESIZE_COST_FACTOR if resize_cost is None else resize_cost
+    
+    # Decoding cost scales with the size of each video, while encoding & resizing costs scale with the output size
+    # (encoding costs more per pixel than decoding, resizing less). A list of sizes can be given for several outputs
+    outputWH_list = outputWH if isinstance(outputWH, list) else [outputWH]
+    output_pixels = sum(each_width * each_height for each_width, each_height in outputWH_list)
+    stream_weights = [each_width * each_height for each_width, each_height in streamWH_list]
+    thread_counts = split_threads(stream_weights + [output_pixels * encode_cost, output_pixels * resize_cost],
+                                  total_threads)
+    
+    thread_budget = {"total_threads": total_threads,
+                     "decoder_threads": thread_counts[:-2],
+                     "encoder_threads": thread_counts[-2],
+                     "resize_threads": thread_counts[-1]}
+    
+    return thread_budget
+
+# .....................................................................................................................
+
+def split_threads(weight_list, total_threads):
+    
+    # Every entry gets at least 1 thread, even if that means using more threads than are available
+    num_entries = len(weight_list)
+    if total_threads <= num_entries:
+        return [1] * num_entries
+    
+    # Split the remaining threads by weight, rounding so that the total is exact (largest remainders go first)
+    weight_array = np.float64(weight_list)
+    spare_threads = total_threads - num_entries
+    raw_shares = spare_threads * weight_array / max(np.sum(weight_array), 1.0)
+    thread_counts = 1 + np.int32(np.floor(raw_shares))
+    num_leftover = total_threads - int(np.sum(thread_counts))
+    for each_idx in np.argsort(np.floor(raw_shares) - raw_shares)[:num_leftover]:
+        thread_counts[each_idx] += 1
+    
+    return [int(each_count) for each_count in thread_counts]
+
+# .....................................................................................................................
+
+def plan_probe_threads(num_streams, total_threads = None):
+    
+    # Videos opened for probing (before their sizes are known) get an even share of the cpu, with a share held
+    # back for encoding & resizing. Videos aren't re-opened, so these counts stick for any video opened this way
+    total_threads = os.cpu_count() if total_threads is None else total_threads
+    
+    return max(1, int(total_threads) // (num_streams + 1))
+
+# .....................................................................................................................
+
+def thread_budget_report(thread_budget, video_name_list = None, encoder_note = None):
+    
+    # Build a listing of how threads were handed out, for printing or logging
+    num_streams = len(thread_budget["decoder_threads"])
+    video_name_list = ["Video {}".format(k) for k in range(num_streams)] if video_name_list is None else video_name_list
+    encoder_str = "{}".format(thread_budget["encoder_threads"])
+    if encoder_note is not None:
+        encoder_str = "{} ({})".format(encoder_str, encoder_note)
+    
+    out_string = ["Thread budget ({} threads):".format(thread_budget["total_threads"])]
+    out_string += ["  Resizing: {}".format(thread_budget["resize_threads"])]
+    out_string += ["  Encoding: {}".format(encoder_str)]
+    out_string += ["  Decoding: {} total".format(sum(thread_budget["decoder_threads"]))]
+    for each_name, each_count in zip(video_name_list, thread_budget["decoder_threads"]):
+        out_string += ["    {}: {}".format(each_name, each_count)]
+    
+    return "\n".join(out_string)
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Globals
+
+ENCODE_COST_FACTOR = 2.0
+RESIZE_COST_FACTOR = 0.5
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
+
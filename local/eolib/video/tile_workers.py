@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 13:05:37 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import cv2
+import queue
+import numpy as np
+import multiprocessing as mp
+
+from multiprocessing import shared_memory
+
+from local.eolib.video.read_write import Video_Reader
+from local.eolib.video.resizing import Tile_Resizer
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define classes
+
+class Tile_Reader_Process:
+    
+    # .................................................................................................................
+    
+    def __init__(self, video_path_list, frame_index_lists, tileWH, ring_size = 4,
+                 enable_seek_planning = True, cache_folder = None, keyframe_index_lists = None, mp_context = None,
+                 resize_policy = "auto", decoder_threads = None, resize_threads = None):
+        
+        # Store inputs
+        self.video_path_list = video_path_list
+        self.tileWH = tuple(tileWH)
+        self.ring_size = ring_size
+        self.num_videos = len(video_path_list)
+        
+        # Figure out how much shared memory we need. Each slot of the ring holds one tile for every video
+        tile_shape = (self.tileWH[1], self.tileWH[0], 3)
+        self._ring_shape = (ring_size, self.num_videos) + tile_shape
+        ring_bytes = int(np.prod(self._ring_shape))
+        
+        # Allocate the shared memory ring, which the worker writes tiles into
+        self._shared_memory = shared_memory.SharedMemory(create = True, size = ring_bytes)
+        self._ring = np.ndarray(self._ring_shape, dtype = np.uint8, buffer = self._shared_memory.buf)
+        
+        # Set up signalling between processes. Only small (index) messages go through the queue, never images
+        mp_context = mp.get_context() if mp_context is None else mp_context
+        self._free_slots = mp_context.Semaphore(ring_size)
+        self._filled_queue = mp_context.Queue()
+        self._stop_event = mp_context.Event()
+        self._held_slot = None
+        self._finished = False
+        self._changed_tiles = [True] * self.num_videos
+        
+        # Start up the worker process
+        worker_args = (video_path_list,
+                       [np.int32(each_list) for each_list in frame_index_lists],
+                       self.tileWH,
+                       self._shared_memory.name,
+                       self._ring_shape,
+                       self._free_slots,
+                       self._filled_queue,
+                       self._stop_event,
+                       enable_seek_planning,
+                       cache_folder,
+                       keyframe_index_lists,
+                       resize_policy,
+                       decoder_threads,
+                       resize_threads)
+        self._process = mp_context.Process(target = _tile_worker, args = worker_args, daemon = True)
+        self._process.start()
+    
+    # .................................................................................................................
+    
+    def read_tiles(self):
+        
+        # Make sure we're not holding on to previous tiles, otherwise the worker could stall
+        self.release_tiles()
+        
+        # Once the worker is done, just report bad tiles
+        if self._finished:
+            self._changed_tiles = [True] * self.num_videos
+            return [None] * self.num_videos
+        
+        # Wait for the next set of tiles, but don't wait forever if the worker has died
+        filled_item = None
+        while True:
+            try:
+                filled_item = self._filled_queue.get(timeout = 0.5)
+                break
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+        
+        # A 'None' entry means the worker has finished (or crashed)
+        if filled_item is None:
+            self._finished = True
+            self._changed_tiles = [True] * self.num_videos
+            return [None] * self.num_videos
+        
+        # Hand back views into the shared ring. These are only valid until release_tiles() is called!
+        # (unchanged tiles are not re-written by the worker, so their slot doesn't hold valid data)
+        output_index, slot_index, good_tile_list, changed_tile_list = filled_item
+        self._held_slot = slot_index
+        self._changed_tiles = changed_tile_list
+        tile_list = [self._ring[slot_index, each_idx] if each_good else None
+                     for each_idx, each_good in enumerate(good_tile_list)]
+        
+        return tile_list
+    
+    # .................................................................................................................
+    
+    def changed_tiles(self):
+        # Report which of the most recently read tiles are different from the tile before
+        return self._changed_tiles
+    
+    # .................................................................................................................
+    
+    def release_tiles(self):
+        
+        # Give the slot back to the worker, so it can be re-filled
+        if self._held_slot is not None:
+            self._free_slots.release()
+            self._held_slot = None
+    
+    # .................................................................................................................
+    
+    def close(self):
+        
+        # Tell the worker to stop and wait for it to shut down
+        self._stop_event.set()
+        self.release_tiles()
+        self._process.join(timeout = 5.0)
+        if self._process.is_alive():
+            self._process.terminate()
+            self._process.join()
+        
+        # Clean up the shared memory (the array view must be removed before the memory can be closed)
+        self._ring = None
+        self._shared_memory.close()
+        self._shared_memory.unlink()
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
+class Tile_Reader_Pool:
+    
+    # .................................................................................................................
+    
+    def __init__(self, video_path_list, frame_index_lists, tileWH, num_processes = None, ring_size = 4,
+                 enable_seek_planning = True, cache_folder = None, keyframe_index_lists = None, mp_context = None,
+                 resize_policy = "auto", decoder_threads = None, resize_threads = None):
+        
+        # Don't start more processes than we have videos
+        num_videos = len(video_path_list)
+        num_processes = os.cpu_count() if num_processes is None else num_processes
+        num_processes = max(1, min(num_videos, num_processes))
+        
+        # Split the videos into (contiguous) groups, with one worker process per group
+        group_index_lists = np.array_split(np.arange(num_videos), num_processes)
+        
+        # Share the resizing threads between workers, since each resizes it's own tiles
+        worker_resize_threads = None if resize_threads is None else max(1, resize_threads // num_processes)
+        self._workers = []
+        for each_group in group_index_lists:
+            group_paths = [video_path_list[each_idx] for each_idx in each_group]
+            group_frame_indices = [frame_index_lists[each_idx] for each_idx in each_group]
+            group_keyframes = None
+            if keyframe_index_lists is not None:
+                group_keyframes = [keyframe_index_lists[each_idx] for each_idx in each_group]
+            group_decoder_threads = None
+            if decoder_threads is not None:
+                group_decoder_threads = [decoder_threads[each_idx] for each_idx in each_group]
+            new_worker = Tile_Reader_Process(group_paths, group_frame_indices, tileWH, ring_size,
+                                             enable_seek_planning, cache_folder, group_keyframes, mp_context,
+                                             resize_policy, group_decoder_threads, worker_resize_threads)
+            self._workers.append(new_worker)
+    
+    # .................................................................................................................
+    
+    def __repr__(self):
+        out_string = ["Tile reader pool"]
+        out_string += ["  Processes: {}".format(len(self._workers))]
+        out_string += ["  Videos per process: {}".format([each.num_videos for each in self._workers])]
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def read_tiles(self):
+        
+        # Gather tiles from each worker, in the original video ordering
+        tile_list = []
+        for each_worker in self._workers:
+            tile_list += each_worker.read_tiles()
+        
+        return tile_list
+    
+    # .................................................................................................................
+    
+    def changed_tiles(self):
+        
+        changed_tile_list = []
+        for each_worker in self._workers:
+            changed_tile_list += each_worker.changed_tiles()
+        
+        return changed_tile_list
+    
+    # .................................................................................................................
+    
+    def release_tiles(self):
+        for each_worker in self._workers:
+            each_worker.release_tiles()
+    
+    # .................................................................................................................
+    
+    def close(self):
+        for each_worker in self._workers:
+            each_worker.close()
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def _attach_shared_memory(shared_memory_name):
+    
+    # Attach without registering with the resource tracker (when supported, python 3.13+),
+    # since the main process is responsible for cleaning up the shared memory
+    try:
+        return shared_memory.SharedMemory(name = shared_memory_name, track = False)
+    except TypeError:
+        return shared_memory.SharedMemory(name = shared_memory_name)
+
+# .....................................................................................................................
+
+def _tile_worker(video_path_list, frame_index_lists, tileWH, shared_memory_name, ring_shape,
+                 free_slots, filled_queue, stop_event, enable_seek_planning, cache_folder, keyframe_index_lists,
+                 resize_policy = "auto", decoder_threads = None, resize_threads = None):
+    
+    # Attach to the ring of tiles shared with the main process
+    worker_memory = _attach_shared_memory(shared_memory_name)
+    ring = np.ndarray(ring_shape, dtype = np.uint8, buffer = worker_memory.buf)
+    ring_size = ring_shape[0]
+    
+    # Limit threading so that workers don't compete with each other for the cpu, if needed
+    if resize_threads is not None:
+        cv2.setNumThreads(resize_threads)
+    
+    # Open every video this worker is responsible for
+    decoder_threads = [None] * len(video_path_list) if decoder_threads is None else decoder_threads
+    video_objects = [Video_Reader(each_path, decoder_threads = each_thread_count)
+                     for each_path, each_thread_count in zip(video_path_list, decoder_threads)]
+    resizer = Tile_Resizer(resize_policy)
+    
+    # Set up seek planning, using keyframe info from the main process if available, otherwise load/build it here
+    if keyframe_index_lists is not None:
+        for each_video_object, each_keyframe_list in zip(video_objects, keyframe_index_lists):
+            if each_keyframe_list is not None:
+                each_video_object.enable_seek_planning(keyframe_indices = each_keyframe_list)
+    elif enable_seek_planning:
+        for each_video_object, each_index_list in zip(video_objects, frame_index_lists):
+            if len(each_index_list) > 1 and np.max(np.diff(each_index_list)) > 1:
+                each_video_object.enable_seek_planning(cache_folder)
+    
+    # Allocate storage for keeping track of repeated/bad frames
+    num_videos = len(video_objects)
+    prev_index_list = [None] * num_videos
+    good_tile_list = [True] * num_videos
+    num_output_frames = len(frame_index_lists[0]) if num_videos > 0 else 0
+    
+    try:
+        for k in range(num_output_frames):
+            
+            # Wait for a free slot in the ring (i.e. the main process has finished with it)
+            while not free_slots.acquire(timeout = 0.1):
+                if stop_event.is_set():
+                    return
+            if stop_event.is_set():
+                return
+            
+            slot_index = k % ring_size
+            changed_tile_list = [True] * num_videos
+            for v_idx, each_video_object in enumerate(video_objects):
+                
+                # Skip videos that have already run out of frames
+                if not good_tile_list[v_idx]:
+                    continue
+                
+                # Nothing to do if the target frame hasn't changed, since the main process still has the tile
+                target_idx = int(frame_index_lists[v_idx][k])
+                tile_view = ring[slot_index, v_idx]
+                if target_idx == prev_index_list[v_idx]:
+                    changed_tile_list[v_idx] = False
+                    continue
+                
+                # Decode the target frame and resize it directly into shared memory
+                request_break, new_frame = each_video_object.read_at(target_idx)
+                if request_break:
+                    print("Bad frame! Video {} frame {}".format(each_video_object.video_name, target_idx))
+                    good_tile_list[v_idx] = False
+                    continue
+                resizer.resize_into(new_frame, tile_view)
+                prev_index_list[v_idx] = target_idx
+            
+            # Tell the main process which slot was filled
+            filled_queue.put((k, slot_index, list(good_tile_list), changed_tile_list))
+    
+    finally:
+        
+        # Signal that no more tiles are coming and clean up
+        filled_queue.put(None)
+        for each_video_object in video_objects:
+            each_video_object.close()
+        tile_view = ring = None
+        worker_memory.close()
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Demo
+
+if __name__ == "__main__":
+    
+    pass
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
@@ -7,8 +7,11 @@ Created on Fri Jul 13 16:04:54 2018
 
 """
 
+import os
 import cv2
+import threading
 import numpy as np
+from array import array
 from time import perf_counter
 
 # ---------------------------------------------------------------------------------------------------------------------
@@ -340,7 +343,7 @@ class Slider_Control:
 
 class Process_Timer:
     
-    def __init__(self, frameWH = (500, 30), alpha = 0.95):
+    def __init__(self, frameWH = (500, 30), alpha = 0.95, keep_history = False):
         
         # Create a blank image to draw in to        
         self._empty_frame = np.zeros((frameWH[1], frameWH[0], 3), dtype=np.uint8)
@@ -350,6 +353,12 @@ class Process_Timer:
         self._end_time = cv2.getTickCount()
         self.proc_time_sec = 0.0
         
+        # Allocate space for recording every timing result (if needed), used for reporting latency percentiles
+        self._history = array("d") if keep_history else None
+        self.count = 0
+        self.total_sec = 0.0
+        self.max_sec = 0.0
+        
         # Store averaging parameters
         self.alpha = max(min(1.0, alpha), 0.0)
         self._inv_alpha = 1 - self.alpha
@@ -376,10 +385,40 @@ class Process_Timer:
     
     def end(self):
         self._end_time = perf_counter()
+        self.record(self._end_time - self._start_time)
+        
+    # .................................................................................................................
+    
+    def record(self, elapsed_sec):
         
         # Average the process time with previous timing
-        self.proc_time_sec = self.alpha*self.proc_time_sec + self._inv_alpha*(self._end_time - self._start_time)
+        self.proc_time_sec = self.alpha*self.proc_time_sec + self._inv_alpha*elapsed_sec
         
+        # Keep track of totals
+        self.count += 1
+        self.total_sec += elapsed_sec
+        self.max_sec = max(self.max_sec, elapsed_sec)
+        if self._history is not None:
+            self._history.append(elapsed_sec)
+    
+    # .................................................................................................................
+    
+    def stats(self, percentiles = (50, 95, 99)):
+        
+        # Report timing totals (in seconds), along with latency percentiles if a history is kept
+        stats_dict = {"count": self.count,
+                      "total_sec": self.total_sec,
+                      "mean_sec": self.total_sec / max(1, self.count),
+                      "max_sec": self.max_sec}
+        
+        if self._history is not None and self.count > 0:
+            history_array = np.frombuffer(self._history, dtype = np.float64)
+            percentile_values = np.percentile(history_array, percentiles)
+            for each_pct, each_value in zip(percentiles, percentile_values):
+                stats_dict["p{}_sec".format(each_pct)] = float(each_value)
+        
+        return stats_dict
+    
     # .................................................................................................................
     
     def draw(self):
@@ -395,6 +434,124 @@ class Process_Timer:
 # =====================================================================================================================
 
 
+class Stage_Profiler:
+    
+    # .................................................................................................................
+    
+    def __init__(self, enabled = True):
+        
+        # Allocate storage for a timer per stage (created as needed)
+        self._timers = {}
+        self._wall_start = perf_counter()
+        self._wall_end = None
+        
+        # Blowout functions if profiling is disabled, so there is no need to check for it everywhere
+        if not enabled:
+            def blankFunc(*args, **kwargs): return None
+            self.start = blankFunc
+            self.end = blankFunc
+            self.record = blankFunc
+    
+    # .................................................................................................................
+    
+    def start(self, stage_name):
+        self._get_timer(stage_name).start()
+    
+    # .................................................................................................................
+    
+    def end(self, stage_name):
+        self._get_timer(stage_name).end()
+    
+    # .................................................................................................................
+    
+    def record(self, stage_name, elapsed_sec):
+        self._get_timer(stage_name).record(elapsed_sec)
+    
+    # .................................................................................................................
+    
+    def finish(self):
+        self._wall_end = perf_counter()
+    
+    # .................................................................................................................
+    
+    def report(self):
+        
+        # Get the overall run time, up until now if we haven't finished
+        wall_end = perf_counter() if self._wall_end is None else self._wall_end
+        wall_sec = wall_end - self._wall_start
+        
+        # Bundle up stats for each stage, in the order they were first used
+        stage_dict = {}
+        for each_name, each_timer in self._timers.items():
+            each_stats = each_timer.stats()
+            each_stats["fraction_of_wall"] = each_stats["total_sec"] / max(wall_sec, 1e-12)
+            stage_dict[each_name] = each_stats
+        
+        return {"wall_sec": wall_sec, "stages": stage_dict}
+    
+    # .................................................................................................................
+    
+    def report_string(self):
+        
+        report_dict = self.report()
+        
+        # Build a simple table of results (in milliseconds)
+        name_width = max([len(each_name) for each_name in report_dict["stages"]] + [5])
+        header_str = "{:<{w}}  {:>8}  {:>10}  {:>8}  {:>8}  {:>8}  {:>6}"
+        row_str = "{:<{w}}  {:>8}  {:>10.1f}  {:>8.2f}  {:>8.2f}  {:>8.2f}  {:>5.1f}%"
+        out_string = ["Stage timing (ms), total run time: {:.1f} s".format(report_dict["wall_sec"])]
+        out_string += [header_str.format("Stage", "Count", "Total", "p50", "p95", "p99", "Wall", w = name_width)]
+        for each_name, each_stats in report_dict["stages"].items():
+            out_string += [row_str.format(each_name, 
+                                          each_stats["count"], 
+                                          1000 * each_stats["total_sec"],
+                                          1000 * each_stats.get("p50_sec", 0),
+                                          1000 * each_stats.get("p95_sec", 0),
+                                          1000 * each_stats.get("p99_sec", 0),
+                                          100 * each_stats["fraction_of_wall"],
+                                          w = name_width)]
+        
+        return "\n".join(out_string)
+    
+    # .................................................................................................................
+    
+    def save_report(self, save_path, extra_info = None):
+        
+        import json
+        
+        # Save results in json format, along with any extra info (e.g. run settings)
+        report_dict = self.report()
+        if extra_info is not None:
+            report_dict = {**extra_info, **report_dict}
+        
+        save_folder = os.path.dirname(save_path)
+        if save_folder != "":
+            os.makedirs(save_folder, exist_ok = True)
+        with open(save_path, "w") as out_file:
+            json.dump(report_dict, out_file, indent = 2)
+        
+        return save_path
+    
+    # .................................................................................................................
+    
+    def _get_timer(self, stage_name):
+        
+        # Create new timers when a stage is first used
+        if stage_name not in self._timers:
+            self._timers[stage_name] = Process_Timer(frameWH = (1, 1), keep_history = True)
+        
+        return self._timers[stage_name]
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+
+    
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
+
 class Progress_Bar:
     
     # .................................................................................................................
@@ -439,17 +596,18 @@ class Progress_Bar:
     
     # .................................................................................................................
     
-    def update(self):
+    def update(self, current_iteration = None):
         
-        # Auto increment the iterations
-        self.current_iteration += 1
+        # Auto increment the iterations, unless a specific iteration is given
+        force_update = (current_iteration is not None)
+        self.current_iteration = current_iteration if force_update else (self.current_iteration + 1)
         
         # Don't bother doing anything if the window doesn't exist
         if not self.prog_window.exists():
             return False
         
         # Only update the image based on the update rate (i.e. 'timelapsed')
-        if (self.current_iteration % self.update_rate) == 0:
+        if force_update or (self.current_iteration % self.update_rate) == 0:
             frame_image = self._draw_progress_bar(self.base_image)
             final_image = self._draw_border(frame_image)
             self.prog_window.imshow(final_image)
@@ -478,6 +636,152 @@ class Progress_Bar:
 # =====================================================================================================================
 # =====================================================================================================================
 
+
+class Threaded_Preview:
+    
+    # .................................................................................................................
+    
+    def __init__(self, window_label = "Preview",
+                 update_rate_hz = 5.0,
+                 max_displayWH = (1280, 720),
+                 total_iterations = None,
+                 progress_label = "Progress",
+                 enabled = True):
+        
+        # Store display settings
+        self.window_label = window_label
+        self.update_period_sec = 1.0 / update_rate_hz
+        self.max_displayWH = max_displayWH
+        self.total_iterations = total_iterations
+        self.progress_label = progress_label
+        self._enabled = enabled
+        
+        # Storage for the most recent frame. Older frames are simply replaced (i.e. dropped) if the display is behind
+        self._frame_lock = threading.Lock()
+        self._latest_frame = None
+        self._latest_iteration = 0
+        self._last_submit_time = -np.inf
+        self._new_frame_event = threading.Event()
+        
+        # Set up thread control variables
+        self._stop_event = threading.Event()
+        self._cancel_requested = False
+        self._display_thread = None
+    
+    # .................................................................................................................
+    
+    def start(self):
+        
+        if (not self._enabled) or (self._display_thread is not None):
+            return
+        
+        # All window handling happens on the display thread, so that it never blocks the calling thread
+        self._stop_event.clear()
+        self._display_thread = threading.Thread(target = self._display_loop, daemon = True)
+        self._display_thread.start()
+    
+    # .................................................................................................................
+    
+    def update(self, frame, current_iteration = None):
+        
+        # Returns False if the user has asked to stop (keypress or closing the window)
+        if not self._enabled:
+            return True
+        
+        # Keep track of progress even if we don't take the frame
+        with self._frame_lock:
+            self._latest_iteration = current_iteration if current_iteration is not None else (self._latest_iteration + 1)
+        
+        # Skip frames arriving faster than the display rate, before doing any copying
+        time_now = perf_counter()
+        if (time_now - self._last_submit_time) < self.update_period_sec:
+            return (not self._cancel_requested)
+        self._last_submit_time = time_now
+        
+        # Take a (downscaled) copy, since the incoming frame may be re-used by the caller
+        frame_height, frame_width = frame.shape[0:2]
+        requires_downscaling, scaledWH = downscale_to_target((frame_width, frame_height), self.max_displayWH)
+        preview_frame = cv2.resize(frame, dsize = scaledWH, interpolation = cv2.INTER_NEAREST) \
+                        if requires_downscaling else frame.copy()
+        
+        # Hand the frame over to the display thread
+        with self._frame_lock:
+            self._latest_frame = preview_frame
+        self._new_frame_event.set()
+        
+        return (not self._cancel_requested)
+    
+    # .................................................................................................................
+    
+    def cancel_requested(self):
+        return self._cancel_requested
+    
+    # .................................................................................................................
+    
+    def close(self):
+        
+        if self._display_thread is None:
+            return
+        
+        self._stop_event.set()
+        self._new_frame_event.set()
+        self._display_thread.join()
+        self._display_thread = None
+    
+    # .................................................................................................................
+    
+    def _display_loop(self):
+        
+        # Create windows from the display thread (OpenCV windows should only be handled by a single thread)
+        disp_window = None
+        prog_bar = None
+        if self.total_iterations is not None:
+            prog_bar = Progress_Bar(total_iterations = self.total_iterations, window_label = self.progress_label)
+        
+        while not self._stop_event.is_set():
+            
+            # Wait (briefly) for a new frame, so we still respond to keypresses if frames stop arriving
+            self._new_frame_event.wait(timeout = self.update_period_sec)
+            self._new_frame_event.clear()
+            
+            # Grab the latest frame & progress
+            with self._frame_lock:
+                new_frame = self._latest_frame
+                current_iteration = self._latest_iteration
+                self._latest_frame = None
+            
+            # Show the new frame, creating the window once we know the frame size
+            if new_frame is not None:
+                if disp_window is None:
+                    disp_window = SimpleWindow(self.window_label)
+                    center_window(disp_window, frameWH = new_frame.shape[1::-1])
+                window_exists = disp_window.imshow(new_frame)
+                if not window_exists:
+                    self._cancel_requested = True
+            
+            # Update the progress bar (closing it also counts as a cancel request)
+            if prog_bar is not None:
+                prog_exists = prog_bar.update(current_iteration)
+                if not prog_exists:
+                    self._cancel_requested = True
+            
+            # Check for keypresses
+            reqBreak, keypress = breakByKeypress(1)
+            if reqBreak:
+                self._cancel_requested = True
+        
+        # Clean up windows on the same thread that created them
+        cv2.destroyAllWindows()
+        cv2.waitKey(1)
+    
+    # .................................................................................................................
+    
+    # .................................................................................................................
+    
+# =====================================================================================================================
+# =====================================================================================================================
+# =====================================================================================================================
+
     
 # ---------------------------------------------------------------------------------------------------------------------
 #%% Define functions
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:05:12 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import sys
+import cv2
+import pytest
+import numpy as np
+
+# Make the repo importable when running pytest from anywhere
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def frame_value(video_idx, frame_idx):
+    # Each frame of each test video is a solid color, unique to the frame, so tiles can be checked after encoding
+    return (20 + 7 * frame_idx + 3 * video_idx) % 256
+
+# .....................................................................................................................
+
+def make_test_video(video_path, video_idx, num_frames, frameWH = (64, 48), fps = 30.0):
+    
+    video_writer = cv2.VideoWriter(video_path, cv2.VideoWriter_fourcc(*"MJPG"), fps, frameWH)
+    for frame_idx in range(num_frames):
+        frame = np.full((frameWH[1], frameWH[0], 3), frame_value(video_idx, frame_idx), dtype = np.uint8)
+        video_writer.write(frame)
+    video_writer.release()
+    
+    return video_path
+
+# .....................................................................................................................
+
+def read_all_frames(video_path):
+    
+    capture = cv2.VideoCapture(video_path)
+    frame_list = []
+    while True:
+        received_frame, frame = capture.read()
+        if not received_frame:
+            break
+        frame_list.append(frame)
+    capture.release()
+    
+    return frame_list
+
+# .....................................................................................................................
+
+def get_tile_values(frame, number_rows, number_columns, number_tiles):
+    
+    # Get the (average) value at the center of each tile, tiles are placed left-to-right, top-to-bottom
+    tile_height = frame.shape[0] // number_rows
+    tile_width = frame.shape[1] // number_columns
+    tile_values = []
+    for tile_idx in range(number_tiles):
+        row_idx, col_idx = divmod(tile_idx, number_columns)
+        y1, x1 = row_idx * tile_height + tile_height // 4, col_idx * tile_width + tile_width // 4
+        y2, x2 = y1 + tile_height // 2, x1 + tile_width // 2
+        tile_values.append(float(np.mean(frame[y1:y2, x1:x2])))
+    
+    return tile_values
+
+# .....................................................................................................................
+
+def count_wrong_tiles(output_path, frame_index_lists, number_rows, number_columns, tolerance = 4):
+    
+    # Compare every tile of every output frame against the value of the frame it should have come from
+    number_tiles = len(frame_index_lists)
+    num_wrong = 0
+    for k, each_frame in enumerate(read_all_frames(output_path)):
+        tile_values = get_tile_values(each_frame, number_rows, number_columns, number_tiles)
+        for v_idx, each_value in enumerate(tile_values):
+            expected_value = frame_value(v_idx, frame_index_lists[v_idx][k])
+            if abs(each_value - expected_value) > tolerance:
+                num_wrong += 1
+    
+    return num_wrong
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Fixtures
+
+@pytest.fixture
+def test_videos(tmp_path):
+    # Videos of different lengths, so they get stretched (i.e. repeat frames) by different amounts
+    return [make_test_video(str(tmp_path / "video_{}.avi".format(k)), k, num_frames)
+            for k, num_frames in enumerate([30, 22, 15])]
+
+# .....................................................................................................................
+
+@pytest.fixture
+def ts(tmp_path, monkeypatch):
+    
+    import tylerScript
+    
+    # Keep caches out of the home folder & record with a codec that is always available
+    cache_folder = str(tmp_path / "cache")
+    monkeypatch.setattr(tylerScript, "cache_folder_path", cache_folder)
+    monkeypatch.setattr(tylerScript, "probe_cache_path", os.path.join(cache_folder, "probe_cache.json"))
+    monkeypatch.setattr(tylerScript, "codec_cache_path", os.path.join(cache_folder, "codec_ranking.json"))
+    monkeypatch.setattr(tylerScript, "recording_codec", "MJPG")
+    monkeypatch.setattr(tylerScript, "enable_profiling", False)
+    
+    return tylerScript
@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:41:26 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import json
+import pytest
+import threading
+
+from conftest import read_all_frames
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def make_batch_file(test_videos, tmp_path):
+    
+    batch_dict = {"inputs": test_videos,
+                  "outputs": [{"path": "batch_a.avi", "minutes": 40 / (30.0 * 60), "fps": 30.0, "columns": 2},
+                              {"path": "batch_b.avi", "minutes": 25 / (30.0 * 60), "fps": 30.0, "columns": 3}]}
+    batch_path = tmp_path / "batch.json"
+    with open(batch_path, "w") as out_file:
+        json.dump(batch_dict, out_file)
+    
+    return str(batch_path)
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("threaded_reading", [False, True])
+def test_interrupted_batch_cleanup(ts, test_videos, tmp_path, monkeypatch, threaded_reading):
+    
+    monkeypatch.setattr(ts, "enable_threaded_reading", threaded_reading)
+    batch_path = make_batch_file(test_videos, tmp_path)
+    
+    # Keep track of the readers & recorders made for the batch
+    created_readers = []
+    original_get_videos = ts.get_videos
+    def tracking_get_videos(*args, **kwargs):
+        created_readers.extend(original_get_videos(*args, **kwargs))
+        return created_readers
+    monkeypatch.setattr(ts, "get_videos", tracking_get_videos)
+    
+    created_recorders = []
+    original_create_recorder = ts.create_recorder
+    def tracking_create_recorder(*args, **kwargs):
+        created_recorders.append(original_create_recorder(*args, **kwargs))
+        return created_recorders[-1]
+    monkeypatch.setattr(ts, "create_recorder", tracking_create_recorder)
+    
+    # Simulate Ctrl-C part way through the batch
+    original_get_target_frames = ts.get_target_frames
+    def interrupting_get_target_frames(video_object_list, current_index, *args, **kwargs):
+        if current_index == 20:
+            raise KeyboardInterrupt
+        return original_get_target_frames(video_object_list, current_index, *args, **kwargs)
+    monkeypatch.setattr(ts, "get_target_frames", interrupting_get_target_frames)
+    
+    # Every reader, recorder & thread should be shut down, even though the batch didn't finish
+    threads_before = set(threading.enumerate())
+    with pytest.raises(KeyboardInterrupt):
+        ts.run_batch(batch_path)
+    assert [each_thread for each_thread in threading.enumerate() if each_thread not in threads_before] == []
+    assert len(created_readers) == len(test_videos)
+    assert not any(each_reader.is_open() for each_reader in created_readers)
+    assert len(created_recorders) == 2
+    assert not any(each_recorder._video_writer.isOpened() for each_recorder in created_recorders)
+    
+    # The outputs written so far should still be readable
+    assert len(read_all_frames(str(tmp_path / "batch_a.avi"))) > 0
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 20:11:48 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import pytest
+import threading
+
+from conftest import count_wrong_tiles, read_all_frames
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def get_expected_indices(ts, video_paths, number_output_frames):
+    video_objects = ts.get_videos(video_paths)
+    return ts.get_sampling_indices(video_objects, number_output_frames)
+
+# .....................................................................................................................
+
+def render(ts, video_paths, output_path, minutes):
+    ts.run_headless(video_paths, minutes, output_path, output_fps = 30.0, number_columns = 2)
+
+# .....................................................................................................................
+
+def interrupt_at(ts, monkeypatch, interrupt_index):
+    
+    # Simulate Ctrl-C part way through the render
+    original_get_target_frames = ts.get_target_frames
+    def interrupting_get_target_frames(video_object_list, current_index, *args, **kwargs):
+        if current_index == interrupt_index:
+            raise KeyboardInterrupt
+        return original_get_target_frames(video_object_list, current_index, *args, **kwargs)
+    monkeypatch.setattr(ts, "get_target_frames", interrupting_get_target_frames)
+    
+    return original_get_target_frames
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("threaded_reading", [False, True])
+def test_resumed_render_content(ts, test_videos, tmp_path, monkeypatch, capsys, threaded_reading):
+    
+    monkeypatch.setattr(ts, "enable_threaded_reading", threaded_reading)
+    monkeypatch.setattr(ts, "enable_checkpoints", True)
+    monkeypatch.setattr(ts, "checkpoint_interval_frames", 20)
+    output_path = str(tmp_path / "tiled.avi")
+    minutes = 100 / (30.0 * 60)
+    
+    # Interrupt the render, then re-run it, which should pick up from the last checkpoint
+    original_get_target_frames = interrupt_at(ts, monkeypatch, 50)
+    with pytest.raises(KeyboardInterrupt):
+        render(ts, test_videos, output_path, minutes)
+    monkeypatch.setattr(ts, "get_target_frames", original_get_target_frames)
+    render(ts, test_videos, output_path, minutes)
+    assert "Resuming render from frame 40" in capsys.readouterr().out
+    
+    # Every tile of the resumed render should show the frame it was sampled from
+    frame_index_lists = get_expected_indices(ts, test_videos, len(read_all_frames(output_path)))
+    assert len(frame_index_lists[0]) == ts.get_output_frame_count(minutes, 30.0)
+    assert count_wrong_tiles(output_path, frame_index_lists, 2, 2) == 0
+
+# .....................................................................................................................
+
+def test_interrupted_render_stops_threads(ts, test_videos, tmp_path, monkeypatch):
+    
+    monkeypatch.setattr(ts, "enable_threaded_reading", True)
+    monkeypatch.setattr(ts, "enable_checkpoints", True)
+    monkeypatch.setattr(ts, "checkpoint_interval_frames", 20)
+    output_path = str(tmp_path / "tiled.avi")
+    
+    # Reader & recorder threads should all be shut down, even though the render didn't finish
+    threads_before = set(threading.enumerate())
+    interrupt_at(ts, monkeypatch, 30)
+    with pytest.raises(KeyboardInterrupt):
+        render(ts, test_videos, output_path, 100 / (30.0 * 60))
+    assert [each_thread for each_thread in threading.enumerate() if each_thread not in threads_before] == []
+
+# .....................................................................................................................
+
+def test_checkpoint_recording_stats(ts, test_videos, tmp_path, monkeypatch, capsys):
+    
+    monkeypatch.setattr(ts, "enable_checkpoints", True)
+    monkeypatch.setattr(ts, "checkpoint_interval_frames", 20)
+    output_path = tmp_path / "tiled.avi"
+    
+    # Recording stats should cover every segment, not just the last one
+    minutes = 100 / (30.0 * 60)
+    number_output_frames = ts.get_output_frame_count(minutes, 30.0)
+    render(ts, test_videos, str(output_path), minutes)
+    assert "Frames written: {}\n".format(number_output_frames) in capsys.readouterr().out
+    assert len(read_all_frames(str(output_path))) == number_output_frames
+    assert not (tmp_path / "tiled.checkpoint").exists()
+
+# .....................................................................................................................
+
+def test_checkpoints_need_lossless_join(ts, test_videos, tmp_path, monkeypatch):
+    
+    # By default, checkpoints shouldn't be used if joining the segments would mean re-encoding them
+    monkeypatch.setattr(ts, "enable_checkpoints", None)
+    monkeypatch.setattr(ts, "checkpoint_interval_frames", 20)
+    monkeypatch.setattr(ts, "can_join_lossless", lambda: False)
+    interrupt_at(ts, monkeypatch, 50)
+    with pytest.raises(KeyboardInterrupt):
+        render(ts, test_videos, str(tmp_path / "tiled.avi"), 100 / (30.0 * 60))
+    assert not (tmp_path / "tiled.checkpoint").exists()
+
+# .....................................................................................................................
+
+def test_unsupported_codec_error(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Recorders which can't be opened don't write any segments, which should be reported clearly
+    monkeypatch.setattr(ts, "recording_codec", "ZZZZ")
+    output_path = str(tmp_path / "tiled.avi")
+    with pytest.raises(IOError, match = "ZZZZ"):
+        render(ts, test_videos, output_path, 30 / (30.0 * 60))
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:02:37 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import sys
+import pytest
+
+from local.eolib.video.read_write import Video_Recorder, Video_Recorder_FFmpeg
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("threaded_recording", [False, True])
+def test_codec_probe_uses_output_size(ts, test_videos, tmp_path, monkeypatch, threaded_recording):
+    
+    monkeypatch.setattr(ts, "recording_codec", "auto")
+    monkeypatch.setattr(ts, "enable_threaded_recording", threaded_recording)
+    
+    # Keep track of the size each codec is tested at
+    probed_WH_list = []
+    original_find_valid_codec = Video_Recorder.find_valid_codec
+    def recording_find_valid_codec(self, test_WH, *args, **kwargs):
+        probed_WH_list.append(tuple(test_WH))
+        return original_find_valid_codec(self, test_WH, *args, **kwargs)
+    monkeypatch.setattr(Video_Recorder, "find_valid_codec", recording_find_valid_codec)
+    
+    # Codecs should be tested at the full output size (2x2 grid of 160x90 tiles), not the size of a single tile
+    output_path = str(tmp_path / "tiled.avi")
+    ts.run_headless(test_videos, 10 / (30.0 * 60), output_path, output_fps = 30.0, number_columns = 2,
+                    output_size_str = "320 x 180")
+    assert probed_WH_list == [(320, 180)]
+
+# .....................................................................................................................
+
+def test_ffmpeg_codec_check(tmp_path):
+    
+    # The encoder should only be reported as usable if ffmpeg can be found and the command is complete
+    def make_recorder(**kwargs):
+        return Video_Recorder_FFmpeg(str(tmp_path / "out.mp4"), 30.0, **kwargs)
+    assert make_recorder(ffmpeg_path = sys.executable).find_valid_codec((64, 48)) == "libx264"
+    assert make_recorder(ffmpeg_path = str(tmp_path / "missing_ffmpeg")).find_valid_codec((64, 48)) is None
+    assert make_recorder(ffmpeg_path = sys.executable, encoder = None).find_valid_codec((64, 48)) is None
+    with pytest.raises(AttributeError):
+        make_recorder(ffmpeg_path = sys.executable).find_valid_codec()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 22:18:03 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import json
+
+from local.eolib.video import indexing
+from local.eolib.video.indexing import Probe_Cache
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def test_single_scan_per_video(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Count the full passes over each video
+    scanned_paths = []
+    original_scan_video_index = indexing.scan_video_index
+    def counting_scan_video_index(video_path):
+        scanned_paths.append(video_path)
+        return original_scan_video_index(video_path)
+    monkeypatch.setattr(indexing, "scan_video_index", counting_scan_video_index)
+    
+    # Frame counts, timing (for sampling) and keyframes (for seeking) should all come from a single pass
+    for each_mode in ["index", "time"]:
+        cache_folder = str(tmp_path / "cache_{}".format(each_mode))
+        monkeypatch.setattr(ts, "frame_sampling_mode", each_mode)
+        monkeypatch.setattr(ts, "cache_folder_path", cache_folder)
+        probe_cache = Probe_Cache(str(tmp_path / "probe_cache_{}.json".format(each_mode)))
+        video_objects = ts.get_videos(test_videos, probe_cache = probe_cache)
+        frame_index_lists = ts.get_sampling_indices(video_objects, 40, probe_cache)
+        ts.get_keyframe_lists(test_videos, frame_index_lists, probe_cache, cache_folder, always_index = True)
+        assert sorted(scanned_paths) == sorted(test_videos)
+        assert [each_video.info("frame_count") for each_video in video_objects] == [30, 22, 15]
+        
+        # Per-frame data belongs in the index files, the probe cache should only hold small values
+        with open(probe_cache.cache_file_path) as in_file:
+            probe_entries = json.load(in_file)
+        for each_entry in probe_entries.values():
+            assert not any(isinstance(each_value, (list, dict)) for each_value in each_entry.values())
+        
+        # Re-running with the saved cache & index files shouldn't need to scan anything
+        scanned_paths = []
+        reloaded_cache = Probe_Cache(probe_cache.cache_file_path)
+        reloaded_index = indexing.get_video_index(test_videos[0], reloaded_cache, cache_folder)
+        assert scanned_paths == []
+        assert reloaded_index["frame_count"] == 30
+        assert len(reloaded_index["timestamps_ms"]) == 30
+        assert reloaded_cache.get(test_videos[0], "true_frame_count") == 30
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:24:50 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import pytest
+import numpy as np
+
+from time import sleep
+
+from conftest import frame_value, make_test_video, count_wrong_tiles, read_all_frames
+
+from local.eolib.video.read_write import Video_Reader, Read_Video_Threaded
+from local.eolib.video.windowing import Stage_Profiler
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def read_value(video_reader, frame_index):
+    request_break, frame = video_reader.read_at(frame_index)
+    assert not request_break
+    return int(np.round(np.mean(frame)))
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("keyframe_indices", [None, [0, 10, 20]])
+def test_read_at_repeated_and_backwards(tmp_path, keyframe_indices):
+    
+    video_reader = Video_Reader(make_test_video(str(tmp_path / "video.avi"), 0, 30))
+    if keyframe_indices is not None:
+        video_reader.enable_seek_planning(keyframe_indices = keyframe_indices)
+    
+    # Reading the same index twice should give the same frame, not the one after it
+    for each_index in [5, 5, 6, 6, 6, 12, 3, 3, 25, 11, 0]:
+        assert abs(read_value(video_reader, each_index) - frame_value(0, each_index)) <= 2
+    video_reader.close()
+
+# .....................................................................................................................
+
+def test_read_at_backwards_after_end(tmp_path):
+    
+    video_reader = Video_Reader(make_test_video(str(tmp_path / "video.avi"), 0, 10))
+    
+    # Running off the end shouldn't stop earlier frames from being read
+    request_break, frame = video_reader.read_at(15)
+    assert request_break and (frame is None)
+    assert abs(read_value(video_reader, 4) - frame_value(0, 4)) <= 2
+    video_reader.close()
+
+# .....................................................................................................................
+
+def test_render_without_tile_reuse(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Without tile re-use, every tile is read on every frame, including repeated frames of stretched videos
+    monkeypatch.setattr(ts, "enable_tile_reuse", False)
+    monkeypatch.setattr(ts, "enable_threaded_reading", False)
+    output_path = str(tmp_path / "tiled.avi")
+    ts.run_headless(test_videos, 60 / (30.0 * 60), output_path, output_fps = 30.0, number_columns = 2)
+    
+    video_objects = ts.get_videos(test_videos)
+    frame_index_lists = ts.get_sampling_indices(video_objects, len(read_all_frames(output_path)))
+    assert count_wrong_tiles(output_path, frame_index_lists, 2, 2) == 0
+
+# .....................................................................................................................
+
+def test_recording_timelapse(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Only every 3rd output frame should be recorded, with the skipped frames dropped before rendering
+    monkeypatch.setattr(ts, "recording_timelapse_factor", 3)
+    output_path = str(tmp_path / "tiled.avi")
+    minutes = 60 / (30.0 * 60)
+    ts.run_headless(test_videos, minutes, output_path, output_fps = 30.0, number_columns = 2)
+    
+    # Compare against the full sampling, keeping every 3rd frame
+    monkeypatch.setattr(ts, "recording_timelapse_factor", 1)
+    video_objects = ts.get_videos(test_videos)
+    full_index_lists = ts.get_sampling_indices(video_objects, ts.get_output_frame_count(minutes, 30.0))
+    frame_index_lists = [each_list[::3] for each_list in full_index_lists]
+    assert len(read_all_frames(output_path)) == len(frame_index_lists[0])
+    assert count_wrong_tiles(output_path, frame_index_lists, 2, 2) == 0
+
+# .....................................................................................................................
+
+def test_threaded_decode_timing(ts, tmp_path, monkeypatch):
+    
+    # Slow down reading (in the background thread) so it's easy to tell apart from waiting on the queue
+    original_read_at = Video_Reader.read_at
+    def slow_read_at(self, frame_index):
+        sleep(0.02)
+        return original_read_at(self, frame_index)
+    monkeypatch.setattr(Video_Reader, "read_at", slow_read_at)
+    
+    # Let the background thread fill up the queue before asking for any frames
+    frame_index_lists = [np.arange(8)]
+    video_reader = Read_Video_Threaded(make_test_video(str(tmp_path / "video.avi"), 0, 10),
+                                       frame_index_lists[0], queue_size = 8)
+    video_reader.start()
+    sleep(0.5)
+    
+    profiler = Stage_Profiler()
+    for k in range(len(frame_index_lists[0])):
+        ts.get_target_frames([video_reader], k, frame_index_lists, profiler)
+    video_reader.close()
+    
+    # Decode timing should come from the reading thread, with the (short) queue wait reported separately
+    stage_dict = profiler.report()["stages"]
+    assert stage_dict["decode [0] video.avi"]["count"] == 8
+    assert stage_dict["decode [0] video.avi"]["total_sec"] >= 8 * 0.02
+    assert stage_dict["queue wait [0] video.avi"]["total_sec"] < 8 * 0.02
+
+# .....................................................................................................................
+
+def test_no_readable_videos(ts, tmp_path):
+    
+    # Files that aren't videos are rejected by probing, which should stop with a clear error if nothing is left
+    bad_paths = []
+    for k in range(2):
+        bad_paths.append(str(tmp_path / "not_a_video_{}.avi".format(k)))
+        with open(bad_paths[-1], "w") as out_file:
+            out_file.write("not a video")
+    
+    with pytest.raises(IOError, match = "No readable videos"):
+        ts.run_headless(bad_paths, 1.0, str(tmp_path / "tiled.avi"))
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 21:51:16 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import sys
+import json
+import subprocess
+
+from time import time
+
+from conftest import count_wrong_tiles, read_all_frames
+
+from local.eolib.video.render_farm import Render_Job, create_render_job
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def make_workers(job_folder, worker_names):
+    
+    # Create a small job (2 units), with workers that identify themselves differently, as if on separate machines
+    create_render_job(job_folder, ["video.avi"], [list(range(20))], [None], {"grid_rows_cols": [1, 1]},
+                      {"path": "tiled.avi"}, frames_per_unit = 10)
+    worker_list = [Render_Job(job_folder) for each_name in worker_names]
+    for each_worker, each_name in zip(worker_list, worker_names):
+        each_worker.worker_id = each_name
+    
+    return worker_list
+
+# .....................................................................................................................
+
+def test_stale_lock_race(tmp_path, monkeypatch):
+    
+    worker_a, worker_b = make_workers(str(tmp_path / "job"), ["worker_a", "worker_b"])
+    first_unit = worker_a.units[0]
+    
+    # Leave an expired lock on the first unit, as if a worker had crashed
+    lock_path = worker_a._lock_path(first_unit)
+    with open(lock_path, "w") as out_file:
+        out_file.write(json.dumps({"worker": "crashed_worker"}))
+    old_time = time() - 3600
+    os.utime(lock_path, (old_time, old_time))
+    
+    # Both workers see the expired lock, but worker a breaks it (and claims the unit) before worker b gets to it
+    original_break_stale_lock = worker_b._break_stale_lock
+    def racing_break_stale_lock(*args, **kwargs):
+        assert worker_a.claim_next_unit(stale_lock_sec = 600) == first_unit
+        return original_break_stale_lock(*args, **kwargs)
+    monkeypatch.setattr(worker_b, "_break_stale_lock", racing_break_stale_lock)
+    
+    # Worker b shouldn't take the unit from worker a, and should move on to the next unit instead
+    assert worker_b.claim_next_unit(stale_lock_sec = 600) == worker_b.units[1]
+    with open(lock_path, "r") as in_file:
+        assert json.load(in_file)["worker"] == "worker_a"
+    assert sorted(os.listdir(worker_a.locks_folder)) == ["unit_0000.lock", "unit_0001.lock"]
+
+# .....................................................................................................................
+
+def test_workers_use_job_encoder(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Create a job using settings that work on this machine
+    monkeypatch.setattr(ts, "render_unit_frames", 20)
+    job_folder = str(tmp_path / "job")
+    output_path = str(tmp_path / "tiled.avi")
+    ts.run_headless(test_videos, 50 / (30.0 * 60), output_path, output_fps = 30.0, number_columns = 2,
+                    job_folder = job_folder)
+    assert Render_Job(job_folder).manifest["output"]["encoder"] == {"backend": "opencv", "codec": "MJPG"}
+    
+    # Workers should encode with the settings from the job, not their own (e.g. on a differently set up machine)
+    monkeypatch.setattr(ts, "recording_codec", "ZZZZ")
+    ts.run_render_worker(job_folder)
+    assert len(read_all_frames(output_path)) == ts.get_output_frame_count(50 / (30.0 * 60), 30.0)
+
+# .....................................................................................................................
+
+def test_claim_after_unit_finished(tmp_path, monkeypatch):
+    
+    worker_a, worker_b = make_workers(str(tmp_path / "job"), ["worker_a", "worker_b"])
+    first_unit = worker_a.units[0]
+    assert worker_a.claim_next_unit() == first_unit
+    
+    # Worker a finishes the first unit after worker b sees it isn't done, but before worker b locks it
+    original_try_lock = worker_b._try_lock
+    def racing_try_lock(lock_path, *args, **kwargs):
+        if lock_path == worker_b._lock_path(first_unit):
+            rendered_path = worker_a.get_unit_temp_path(first_unit)
+            open(rendered_path, "w").close()
+            worker_a.complete_unit(first_unit, rendered_path)
+        return original_try_lock(lock_path, *args, **kwargs)
+    monkeypatch.setattr(worker_b, "_try_lock", racing_try_lock)
+    
+    # Worker b shouldn't render the finished unit again (or leave it locked)
+    assert worker_b.claim_next_unit() == worker_b.units[1]
+    assert not os.path.exists(worker_b._lock_path(first_unit))
+
+# .....................................................................................................................
+
+def test_worker_processes(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Create a job with several units of work
+    monkeypatch.setattr(ts, "render_unit_frames", 15)
+    job_folder = str(tmp_path / "job")
+    output_path = str(tmp_path / "tiled.avi")
+    minutes = 100 / (30.0 * 60)
+    ts.run_headless(test_videos, minutes, output_path, output_fps = 30.0, number_columns = 2, job_folder = job_folder)
+    render_job = Render_Job(job_folder)
+    
+    # Run several workers (as separate processes, like on separate machines) on the job at the same time
+    script_path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "tylerScript.py")
+    worker_env = {**os.environ, "HOME": str(tmp_path / "home")}
+    worker_list = [subprocess.Popen([sys.executable, "-u", script_path, "--worker", job_folder], env = worker_env,
+                                    stdout = subprocess.PIPE, stderr = subprocess.STDOUT, text = True)
+                   for k in range(3)]
+    worker_outputs = [each_worker.communicate(timeout = 300)[0] for each_worker in worker_list]
+    assert all(each_worker.returncode == 0 for each_worker in worker_list), "\n".join(worker_outputs)
+    
+    # Every unit should be rendered exactly once, with a single merge at the end
+    combined_output = "\n".join(worker_outputs)
+    for each_unit in render_job.units:
+        assert combined_output.count("Rendering unit {} ".format(each_unit["index"])) == 1
+    assert combined_output.count("Render job merged") == 1
+    assert render_job.is_merged()
+    
+    # The merged output should have every frame, with every tile showing the frame it was sampled from
+    video_objects = ts.get_videos(test_videos)
+    frame_index_lists = ts.get_sampling_indices(video_objects, ts.get_output_frame_count(minutes, 30.0))
+    assert len(read_all_frames(output_path)) == len(frame_index_lists[0])
+    assert count_wrong_tiles(output_path, frame_index_lists, 2, 2) == 0
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 23:05:42 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import cv2
+import pytest
+
+from local.eolib.video.read_write import Video_Reader
+from local.eolib.video.indexing import Probe_Cache
+from local.eolib.video.thread_budget import plan_thread_budget
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("enable_budget, ffmpeg_threads, expected_args", [(False, 0, None),
+                                                                          (False, 3, ["-threads", "3"]),
+                                                                          (True, 0, ["-threads", "5"])])
+def test_ffmpeg_thread_args(ts, tmp_path, monkeypatch, enable_budget, ffmpeg_threads, expected_args):
+    
+    monkeypatch.setattr(ts, "recording_backend", "ffmpeg")
+    monkeypatch.setattr(ts, "ffmpeg_threads", ffmpeg_threads)
+    
+    # Without a budget there are no encoder threads to hand out, so ffmpeg's own setting is used instead
+    encoder_threads = 5 if enable_budget else None
+    video_out = ts.create_recorder(str(tmp_path / "tiled.mp4"), 30.0, recording_WH = (64, 48),
+                                   encoder_threads = encoder_threads)
+    video_out.frameWH = (64, 48)
+    command_list = video_out.get_ffmpeg_command()
+    if expected_args is None:
+        assert "-threads" not in command_list
+    else:
+        thread_idx = command_list.index("-threads")
+        assert command_list[thread_idx:thread_idx + 2] == expected_args
+
+# .....................................................................................................................
+
+def test_videos_opened_once(ts, test_videos, tmp_path, monkeypatch):
+    
+    # Count every time a reader opens a video
+    opened_paths = []
+    original_open_capture = Video_Reader._open_capture
+    def counting_open_capture(self):
+        opened_paths.append(self.video_source)
+        return original_open_capture(self)
+    monkeypatch.setattr(Video_Reader, "_open_capture", counting_open_capture)
+    
+    # Even without cached info (so videos are opened for probing), the thread budget shouldn't re-open anything
+    monkeypatch.setattr(ts, "enable_thread_budget", True)
+    monkeypatch.setattr(ts, "thread_budget_total", 8)
+    video_objects = ts.get_videos(test_videos, probe_cache = Probe_Cache(str(tmp_path / "probe_cache.json")))
+    thread_budget = ts.get_thread_budget(video_objects, (64, 48), 2, 2)
+    ts.apply_thread_budget(video_objects, thread_budget)
+    for each_video_object in video_objects:
+        each_video_object.open()
+    assert sorted(opened_paths) == sorted(test_videos)
+    
+    # The budget should report the thread counts the (already open) decoders were actually given
+    assert thread_budget["decoder_threads"] == [each_video.decoder_threads() for each_video in video_objects]
+    for each_video_object in video_objects:
+        each_video_object.close()
+
+# .....................................................................................................................
+
+def test_decoder_threads_unsupported(test_videos, monkeypatch):
+    
+    # Older versions of OpenCV don't have the decoder thread property, which shouldn't stop videos from opening
+    monkeypatch.delattr(cv2, "CAP_PROP_N_THREADS")
+    video_reader = Video_Reader(test_videos[0], decoder_threads = 2)
+    request_break, frame = video_reader.read_at(3)
+    assert (not request_break) and (frame is not None)
+    assert video_reader.decoder_threads() is None
+    video_reader.close()
+
+# .....................................................................................................................
+
+@pytest.mark.parametrize("total_threads", [6, 16, 64])
+def test_budget_adds_up(total_threads):
+    
+    # Decoding, encoding & resizing should all share the same pool of threads
+    thread_budget = plan_thread_budget([(1920, 1080), (640, 480), (1280, 720), (320, 240)], (1280, 720), total_threads)
+    total_used = sum(thread_budget["decoder_threads"]) + thread_budget["encoder_threads"]
+    total_used += thread_budget["resize_threads"]
+    assert total_used == total_threads
+    assert min(thread_budget["decoder_threads"] + [thread_budget["resize_threads"]]) >= 1
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Created on Sat Oct 17 19:34:02 2026
+
+@author: eo
+"""
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Imports
+
+import os
+import sys
+import cv2
+import json
+import shutil
+import argparse
+import platform
+import tempfile
+import numpy as np
+import datetime as dt
+
+from time import perf_counter
+
+from local.eolib.video.read_write import Video_Reader, Video_Recorder
+from local.eolib.video.compositing import Tile_Compositor
+from local.eolib.video.resizing import RESIZE_POLICIES
+
+from tylerScript import get_target_frames, get_frame_indices
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Define functions
+
+# .....................................................................................................................
+
+def make_synthetic_frame(frame_index, frameWH, base_image):
+    
+    # Scroll a fixed noise image and draw the frame index, so every frame is different but fully repeatable
+    frame_width, frame_height = frameWH
+    shift_x = (7 * frame_index) % frame_width
+    shift_y = (3 * frame_index) % frame_height
+    frame = np.roll(base_image, (shift_y, shift_x), axis = (0, 1))
+    cv2.putText(frame, "{:06d}".format(frame_index), (10, frame_height - 10),
+                cv2.FONT_HERSHEY_SIMPLEX, 1.0, (255, 255, 255), 2, cv2.LINE_AA)
+    
+    return frame
+
+# .....................................................................................................................
+
+def make_synthetic_video(save_path, frameWH, num_frames, codec, fps = 30.0, seed = 0):
+    
+    # Use a smoothed noise image, so the video compresses somewhat like real footage
+    rng = np.random.default_rng(seed)
+    base_image = rng.integers(0, 256, size = (frameWH[1], frameWH[0], 3), dtype = np.uint8)
+    base_image = cv2.GaussianBlur(base_image, (0, 0), 3)
+    
+    # Record all the frames
+    video_out = Video_Recorder(save_path, fps, recording_WH = frameWH, codec = codec)
+    for frame_idx in range(num_frames):
+        video_out.write(make_synthetic_frame(frame_idx, frameWH, base_image), auto_resize = False)
+    video_out.close()
+    
+    # Check that the video can actually be read back (not every OpenCV build supports every codec)
+    if not os.path.exists(save_path):
+        return False
+    test_reader = Video_Reader(save_path)
+    video_is_valid = (test_reader.info("frame_count") > 0)
+    test_reader.close()
+    
+    return video_is_valid
+
+# .....................................................................................................................
+
+def build_result(stage_name, num_frames, elapsed_sec, num_bytes, **extra_info):
+    
+    # Bundle timing results into a consistent (json-friendly) format
+    safe_elapsed = max(elapsed_sec, 1e-12)
+    result_dict = {"stage": stage_name,
+                   "frames": int(num_frames),
+                   "seconds": elapsed_sec,
+                   "fps": num_frames / safe_elapsed,
+                   "mb_per_sec": (num_bytes / 1e6) / safe_elapsed,
+                   **extra_info}
+    
+    return result_dict
+
+# .....................................................................................................................
+
+def bench_read(video_path):
+    
+    # Time decoding every frame of the video
+    video_object = Video_Reader(video_path)
+    num_frames = 0
+    num_bytes = 0
+    t_start = perf_counter()
+    while True:
+        request_break, frame = video_object.read()
+        if request_break:
+            break
+        num_frames += 1
+        num_bytes += frame.nbytes
+    elapsed_sec = perf_counter() - t_start
+    video_object.close()
+    
+    return build_result("Video_Reader.read", num_frames, elapsed_sec, num_bytes)
+
+# .....................................................................................................................
+
+def bench_target_frames(video_path, num_videos, frame_stride):
+    
+    # Time reading a grid of videos, skipping frames as if timelapsing
+    video_objects = [Video_Reader(video_path) for k in range(num_videos)]
+    frame_count = video_objects[0].info("frame_count")
+    num_output_frames = max(1, int(frame_count / frame_stride))
+    frame_index_lists = get_frame_indices(video_objects, num_output_frames)
+    
+    num_bytes = 0
+    t_start = perf_counter()
+    for k in range(num_output_frames):
+        frame_list = get_target_frames(video_objects, k, frame_index_lists)
+        num_bytes += sum(each_frame.nbytes for each_frame in frame_list if each_frame is not None)
+    elapsed_sec = perf_counter() - t_start
+    
+    for each_video_object in video_objects:
+        each_video_object.close()
+    
+    return build_result("get_target_frames", num_output_frames, elapsed_sec, num_bytes,
+                        videos = num_videos, frame_stride = frame_stride)
+
+# .....................................................................................................................
+
+def get_test_frames(video_path, num_frames):
+    
+    # Load decoded frames into memory, so that processing stages can be timed without any decoding
+    video_object = Video_Reader(video_path)
+    frame_list = []
+    for k in range(num_frames):
+        request_break, frame = video_object.read()
+        if request_break:
+            break
+        frame_list.append(frame)
+    video_object.close()
+    
+    return frame_list
+
+# .....................................................................................................................
+
+def bench_resize(frame_list, num_rows, num_cols, tileWH, resize_policy = "auto"):
+    
+    # Time resizing full frames into each of the tiles (previously get_scaled_frames)
+    num_tiles = num_rows * num_cols
+    compositor = Tile_Compositor(num_rows, num_cols, tileWH, resize_policy = resize_policy)
+    num_bytes = 0
+    t_start = perf_counter()
+    for each_frame in frame_list:
+        for tile_idx in range(num_tiles):
+            compositor.set_tile(tile_idx, each_frame)
+        num_bytes += each_frame.nbytes * num_tiles
+    elapsed_sec = perf_counter() - t_start
+    
+    return build_result("resize", len(frame_list), elapsed_sec, num_bytes,
+                        tiles = num_tiles, tileWH = list(tileWH), resize_policy = resize_policy)
+
+# .....................................................................................................................
+
+def bench_compose(frame_list, num_rows, num_cols, tileWH):
+    
+    # Time copying already-scaled tiles into the output canvas (previously get_stacked_image)
+    num_tiles = num_rows * num_cols
+    compositor = Tile_Compositor(num_rows, num_cols, tileWH)
+    tile_list = [cv2.resize(each_frame, dsize = tileWH) for each_frame in frame_list]
+    num_bytes = 0
+    t_start = perf_counter()
+    for each_tile in tile_list:
+        combined_frame = compositor.compose([each_tile] * num_tiles)
+        num_bytes += combined_frame.nbytes
+    elapsed_sec = perf_counter() - t_start
+    
+    return build_result("compose", len(tile_list), elapsed_sec, num_bytes,
+                        tiles = num_tiles, outputWH = list(compositor.canvasWH))
+
+# .....................................................................................................................
+
+def bench_write(frame_list, save_path, codec, fps = 30.0):
+    
+    # Time encoding frames into a video file
+    frame_height, frame_width = frame_list[0].shape[0:2]
+    video_out = Video_Recorder(save_path, fps, recording_WH = (frame_width, frame_height), codec = codec)
+    num_bytes = 0
+    t_start = perf_counter()
+    for each_frame in frame_list:
+        video_out.write(each_frame, auto_resize = False)
+        num_bytes += each_frame.nbytes
+    video_out.close()
+    elapsed_sec = perf_counter() - t_start
+    
+    file_bytes = os.path.getsize(save_path) if os.path.exists(save_path) else 0
+    return build_result("Video_Recorder.write", len(frame_list), elapsed_sec, num_bytes,
+                        file_bytes = file_bytes)
+
+# .....................................................................................................................
+
+def get_system_info():
+    
+    info_dict = {"timestamp": dt.datetime.now().isoformat(),
+                 "python": sys.version.split()[0],
+                 "opencv": cv2.__version__,
+                 "numpy": np.__version__,
+                 "platform": platform.platform(),
+                 "processor": platform.processor(),
+                 "cpu_count": os.cpu_count(),
+                 "opencv_threads": cv2.getNumThreads()}
+    
+    return info_dict
+
+# .....................................................................................................................
+
+def run_benchmarks(work_folder, resolution_list, codec_list, num_frames,
+                   grid_size = 4, frame_stride = 4, tileWH = (320, 180), resize_policy_list = RESIZE_POLICIES):
+    
+    # Figure out grid layout for the multi-video stages
+    num_cols = int(np.ceil(np.sqrt(grid_size)))
+    num_rows = int(np.ceil(grid_size / num_cols))
+    
+    results_list = []
+    for each_codec, each_extension in codec_list:
+        for each_WH in resolution_list:
+            
+            # Make the test video
+            test_info = {"codec": each_codec, "resolution": list(each_WH)}
+            video_name = "synthetic_{}x{}_{}{}".format(*each_WH, each_codec, each_extension)
+            video_path = os.path.join(work_folder, video_name)
+            video_ok = make_synthetic_video(video_path, each_WH, num_frames, each_codec)
+            if not video_ok:
+                print("Skipping unsupported codec: {} ({})".format(each_codec, each_extension), file = sys.stderr)
+                results_list.append({"stage": "create", "supported": False, **test_info})
+                break
+            
+            # Time each of the stages in isolation
+            print("Benchmarking: {} @ {} x {}".format(each_codec, *each_WH), file = sys.stderr)
+            frame_list = get_test_frames(video_path, num_frames)
+            write_path = os.path.join(work_folder, "write_{}".format(video_name))
+            stage_results = [bench_read(video_path),
+                             bench_target_frames(video_path, grid_size, frame_stride)]
+            stage_results += [bench_resize(frame_list, num_rows, num_cols, tileWH, each_policy)
+                              for each_policy in resize_policy_list]
+            stage_results += [bench_compose(frame_list, num_rows, num_cols, tileWH),
+                              bench_write(frame_list, write_path, each_codec)]
+            results_list += [{**each_result, **test_info} for each_result in stage_results]
+    
+    return results_list
+
+# .....................................................................................................................
+
+def parse_resolutions(resolution_str):
+    return [tuple(int(each_num) for each_num in each_res.split("x")) for each_res in resolution_str.split(",")]
+
+# .....................................................................................................................
+
+def parse_codecs(codec_str):
+    
+    # Codecs are given as fourcc:extension pairs, for example: MJPG:.avi,mp4v:.mp4
+    codec_list = []
+    for each_entry in codec_str.split(","):
+        fourcc, extension = each_entry.split(":")
+        codec_list.append((fourcc, extension))
+    
+    return codec_list
+
+# .....................................................................................................................
+
+def parse_args():
+    
+    ap = argparse.ArgumentParser(description = "Time each stage of the tiling pipeline using synthetic videos")
+    ap.add_argument("-r", "--resolutions", type = str, default = "640x360,1280x720,1920x1080",
+                    help = "Comma separated list of input resolutions (w x h)")
+    ap.add_argument("-c", "--codecs", type = str, default = "MJPG:.avi,XVID:.avi,X264:.avi,mp4v:.mp4",
+                    help = "Comma separated list of fourcc:extension pairs")
+    ap.add_argument("-n", "--frames", type = int, default = 120, help = "Number of frames per synthetic video")
+    ap.add_argument("-g", "--grid", type = int, default = 4, help = "Number of videos for the multi-video stages")
+    ap.add_argument("-p", "--resize_policies", type = str, default = ",".join(RESIZE_POLICIES),
+                    help = "Comma separated list of resize policies to compare")
+    ap.add_argument("-o", "--output", type = str, default = None, help = "Save results to a json file")
+    ap.add_argument("-w", "--work_folder", type = str, default = None,
+                    help = "Folder for the synthetic videos (a temporary folder is used & removed otherwise)")
+    
+    return ap.parse_args()
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Main
+
+if __name__ == "__main__":
+    
+    args = parse_args()
+    
+    # Create a place to store the synthetic videos
+    remove_work_folder = (args.work_folder is None)
+    work_folder = tempfile.mkdtemp(prefix = "tylerBench_") if remove_work_folder else args.work_folder
+    os.makedirs(work_folder, exist_ok = True)
+    
+    try:
+        results_list = run_benchmarks(work_folder,
+                                      parse_resolutions(args.resolutions),
+                                      parse_codecs(args.codecs),
+                                      args.frames,
+                                      grid_size = args.grid,
+                                      resize_policy_list = args.resize_policies.split(","))
+    finally:
+        if remove_work_folder:
+            shutil.rmtree(work_folder, ignore_errors = True)
+    
+    # Output results in a machine-readable format
+    report_dict = {"system": get_system_info(), "results": results_list}
+    report_str = json.dumps(report_dict, indent = 2)
+    if args.output is None:
+        print(report_str)
+    else:
+        with open(args.output, "w") as out_file:
+            out_file.write(report_str)
+        print("")
+        print("Saved benchmark results:")
+        print(args.output)
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Scrap
@@ -12,12 +12,29 @@ Created on Fri Feb  8 14:26:42 2019
 
 import os
 import cv2
+import json
+import queue
+import shutil
+import argparse
+import threading
 import numpy as np
+import multiprocessing as mp
 
-from local.eolib.utils.files import guiLoadMany, guiSave
+from time import perf_counter, sleep
+
+from local.eolib.utils.files import guiLoadMany, guiSave, get_file_list
 from local.eolib.utils.cli_tools import cli_prompt_with_defaults
-from local.eolib.video.windowing import SimpleWindow, Progress_Bar, breakByKeypress, center_window
-from local.eolib.video.read_write import Video_Reader, Video_Recorder
+from local.eolib.video.windowing import Threaded_Preview, Stage_Profiler
+from local.eolib.video.read_write import Video_Reader, Read_Video_Threaded, Video_Recorder, Video_Recorder_Threaded
+from local.eolib.video.read_write import Video_Recorder_FFmpeg, get_timelapse_plan
+from local.eolib.video.tile_workers import Tile_Reader_Pool
+from local.eolib.video.compositing import Tile_Compositor
+from local.eolib.video.segmenting import get_segment_ranges, get_segment_paths, join_segments, can_join_lossless
+from local.eolib.video.render_farm import Render_Job, create_render_job
+from local.eolib.video.thread_budget import plan_thread_budget, plan_probe_threads, thread_budget_report
+from local.eolib.video.checkpoints import Render_Checkpoint, get_render_signature
+from local.eolib.video.indexing import Probe_Cache, get_video_index, get_true_frame_count
+from local.eolib.video.indexing import get_time_sampled_indices
 
     
 # ---------------------------------------------------------------------------------------------------------------------
@@ -25,28 +42,42 @@ from local.eolib.video.read_write import Video_Reader, Video_Recorder
 
 # .....................................................................................................................
 
-def get_target_frames(video_object_list, current_index, frame_index_lists):
+def get_target_frames(video_object_list, current_index, frame_index_lists, profiler = None, changed_tiles = None):
     
     target_frames = []
     for v_idx, each_video_object in enumerate(video_object_list):
         
-        # Figure out what frame (index) we want from the given video object and what frame we're currently on
+        # Figure out what frame (index) we want from the given video object
         target_idx = frame_index_lists[v_idx][current_index]
-        current_idx = each_video_object.current_frame()
         
-        while True:
-            
-            # Get another frame from the given video
-            (request_break, new_frame) = each_video_object.read()
-            if request_break:
-                print("Bad frame! Video {} frame {} / {}".format(v_idx, current_idx, target_idx))
-                new_frame = None
-                break
-            current_idx += 1
+        # Don't read anything if the target frame hasn't changed, the previous tile gets re-used instead
+        if changed_tiles is not None and not changed_tiles[v_idx]:
+            target_frames.append(None)
+            continue
+        
+        # Videos that ended early give no frame, so that the last good tile is held
+        if each_video_object.reached_end():
+            target_frames.append(None)
+            continue
+        
+        # Skip over (grab only) any frames before the target, and only retrieve the target frame itself
+        t_start = perf_counter()
+        request_break, new_frame = each_video_object.read_at(target_idx)
+        if profiler is not None:
+            read_sec = perf_counter() - t_start
+            stage_name = "decode [{}] {}".format(v_idx, each_video_object.video_name)
             
-            # Once we get the target frame (based on frame index), stop the loop and move on
-            if current_idx >= target_idx:
-                break
+            # Threaded readers decode in the background, so the time spent here is only waiting on the queue
+            if isinstance(each_video_object, Read_Video_Threaded):
+                profiler.record(stage_name, each_video_object.last_decode_sec())
+                profiler.record("queue wait [{}] {}".format(v_idx, each_video_object.video_name), read_sec)
+            else:
+                profiler.record(stage_name, read_sec)
+        if request_break:
+            current_idx = each_video_object.current_frame()
+            print("Bad frame! Video {} frame {} / {}".format(v_idx, current_idx, target_idx))
+            print("  Video ended early, holding last frame: {}".format(each_video_object.video_name))
+            new_frame = None
             
         # Finally, add the frame to the output list
         target_frames.append(new_frame)
@@ -55,46 +86,206 @@ def get_target_frames(video_object_list, current_index, frame_index_lists):
 
 # .....................................................................................................................
 
-def get_scaled_frames(frame_list, num_blank_frames, tileWH):
+def get_changed_tiles(frame_index_lists, current_index, start_index = 0):
     
-    # Replace any bad frames with blanks
-    bad_frames = [each_frame is None for each_frame in frame_list]
-    if any(bad_frames):
-        bad_frame = np.zeros((tileWH[1], tileWH[0], 3), dtype=np.uint8)
-        frame_list = [each_frame if not bad else bad_frame for each_frame, bad in zip(frame_list, bad_frames)]
-        
-    # Scaled down each frame, so that the resulting stacked image won't be too large
-    scaled_frames = [cv2.resize(each_frame, dsize = tileWH) for each_frame in frame_list]
+    # Every tile needs to be drawn on the first frame (or the first frame after resuming)
+    if current_index == start_index:
+        return [True] * len(frame_index_lists)
     
-    # Append blank frames if needed
-    if num_blank_frames > 0:   
-        blank_frame = np.zeros((tileWH[1], tileWH[0], 3), dtype=np.uint8)
-        for k in range(num_blank_frames):
-            scaled_frames.append(blank_frame.copy())
+    # Otherwise tiles only change when the target frame changes (i.e. not when stretching short videos)
+    changed_tiles = [each_list[current_index] != each_list[current_index - 1] for each_list in frame_index_lists]
     
-    return scaled_frames
+    return changed_tiles
 
 # .....................................................................................................................
 
-def get_stacked_image(scaled_frames, num_rows, num_cols):
+def get_videos(video_path_list, threaded = False, probe_cache = None):
+    
+    reader_class = Read_Video_Threaded if threaded else Video_Reader
+    
+    # Videos that need to be opened for probing are given their decoder threads up front, so they aren't re-opened
+    decoder_threads = None
+    if enable_thread_budget:
+        decoder_threads = plan_probe_threads(len(video_path_list), thread_budget_total)
+    
+    # Probe all of the videos in parallel, so that slow/broken files don't hold up everything else
+    probe_results = probe_videos(video_path_list, reader_class, probe_cache,
+                                 num_threads = probe_thread_count,
+                                 timeout_sec = probe_timeout_sec,
+                                 slow_sec = probe_slow_sec,
+                                 decoder_threads = decoder_threads)
+    print_probe_report(probe_results)
+    
+    # Only keep videos that could actually be read
+    video_objects = [each_result["video_object"] for each_result in probe_results
+                     if each_result["video_object"] is not None]
+    
+    # Store info for newly probed videos & save it for re-use
+    if probe_cache is not None:
+        for each_result in probe_results:
+            if each_result["video_object"] is not None and not each_result["cached"]:
+                probe_cache.update(each_result["path"], **get_probe_info(each_result["video_object"]))
+        probe_cache.save()
+    
+    # Nothing else can be done if none of the videos could be read
+    if len(video_objects) == 0:
+        raise IOError("No readable videos (0 / {} could be read), see the probe report above".format(
+            len(video_path_list)))
+    
+    return video_objects
 
-    row_image_list = []
-    for row_idx in range(num_rows):
-        col_stack = []
-        for col_idx in range(num_cols):
-            vid_idx = row_idx * num_cols + col_idx
-            col_stack.append(scaled_frames[vid_idx])
-        
-        col_stack_image = np.hstack((col_stack))
-        row_image_list.append(col_stack_image)
+# .....................................................................................................................
+
+def probe_videos(video_path_list, reader_class, probe_cache = None, num_threads = 8, timeout_sec = 30, slow_sec = 3,
+                 decoder_threads = None):
+    
+    # Allocate storage for probing results & timing
+    num_videos = len(video_path_list)
+    result_list = [None] * num_videos
+    start_times_dict = {}
+    result_lock = threading.Lock()
+    task_queue = queue.Queue()
+    for video_idx in range(num_videos):
+        task_queue.put(video_idx)
+    
+    # Function used by each probing thread, which keeps probing videos until there are none left
+    def probe_thread():
+        while True:
+            
+            # Get the next video to probe
+            try:
+                video_idx = task_queue.get_nowait()
+            except queue.Empty:
+                return
+            video_path = video_path_list[video_idx]
+            probe_start = perf_counter()
+            with result_lock:
+                start_times_dict[video_idx] = probe_start
+            
+            # Try to open the video (or just use cached info, if available)
+            cached_info = None if probe_cache is None else probe_cache.get(video_path)
+            video_object, error_msg = None, None
+            try:
+                video_object = reader_class(video_path, video_info = cached_info, decoder_threads = decoder_threads)
+                if cached_info is None and not is_valid_video(video_object):
+                    video_object.close()
+                    video_object, error_msg = None, "Couldn't read video info"
+            except Exception as err:
+                error_msg = str(err)
+            
+            # Record results, unless we've already given up waiting on this video
+            with result_lock:
+                probe_sec = perf_counter() - probe_start
+                start_times_dict.pop(video_idx, None)
+                if result_list[video_idx] is None:
+                    result_status = "corrupt" if video_object is None else ("slow" if probe_sec > slow_sec else "ok")
+                    result_list[video_idx] = {"path": video_path,
+                                              "status": result_status,
+                                              "seconds": probe_sec,
+                                              "cached": (cached_info is not None),
+                                              "error": error_msg,
+                                              "video_object": video_object}
+                elif video_object is not None:
+                    video_object.close()
+    
+    # Start up probing threads (as daemons, so hung threads can't stop us from exiting)
+    num_threads = max(1, min(num_threads, num_videos))
+    for k in range(num_threads):
+        threading.Thread(target = probe_thread, daemon = True).start()
+    
+    # Wait for every video to finish probing, giving up on any that take too long
+    while True:
+        with result_lock:
+            if all(each_result is not None for each_result in result_list):
+                break
+            
+            time_now = perf_counter()
+            for video_idx, start_time in list(start_times_dict.items()):
+                probe_sec = time_now - start_time
+                if probe_sec > timeout_sec:
+                    result_list[video_idx] = {"path": video_path_list[video_idx],
+                                              "status": "timeout",
+                                              "seconds": probe_sec,
+                                              "cached": False,
+                                              "error": "Timed out after {:.1f} seconds".format(probe_sec),
+                                              "video_object": None}
+                    del start_times_dict[video_idx]
+                    
+                    # The hung thread can't be stopped, so start a new thread to keep working through the videos
+                    threading.Thread(target = probe_thread, daemon = True).start()
         
-    return np.vstack(row_image_list)
+        sleep(0.05)
+    
+    return result_list
 
 # .....................................................................................................................
 
-def get_videos(video_path_list):
-    video_objects = [Video_Reader(each_path) for each_path in video_path_list]
-    return video_objects
+def is_valid_video(video_object):
+    
+    # Check that a video was opened and reported sensible info
+    is_open = video_object.is_open()
+    has_frames = (video_object.info("frame_count") > 0)
+    has_size = (video_object.info("width") > 0) and (video_object.info("height") > 0)
+    
+    return is_open and has_frames and has_size
+
+# .....................................................................................................................
+
+def print_probe_report(probe_results):
+    
+    # Count up the results of each type
+    status_list = [each_result["status"] for each_result in probe_results]
+    status_counts = {each_status: status_list.count(each_status) for each_status in ["ok", "slow", "timeout", "corrupt"]}
+    num_cached = sum(1 for each_result in probe_results if each_result["cached"])
+    
+    print("")
+    print("Probed {} videos ({} from cache)".format(len(probe_results), num_cached))
+    print("  " + ", ".join(["{}: {}".format(each_status, each_count) for each_status, each_count in status_counts.items()]))
+    
+    # List out any problem files, since these are either excluded or slowing things down
+    for each_result in probe_results:
+        if each_result["status"] == "ok":
+            continue
+        each_name = os.path.basename(each_result["path"])
+        each_msg = "  [{}] {} ({:.1f} s)".format(each_result["status"], each_name, each_result["seconds"])
+        if each_result["error"] is not None:
+            each_msg += " - {}".format(each_result["error"])
+        print(each_msg)
+
+# .....................................................................................................................
+
+def get_probe_info(video_object):
+    
+    # Get the subset of video info needed to re-create a video reader without opening the video
+    probe_keys = ["frame_count", "fps", "width", "height", "codec"]
+    probe_info = {each_key: video_object.info(each_key) for each_key in probe_keys}
+    
+    return probe_info
+
+# .....................................................................................................................
+
+def correct_frame_counts(video_object_list, probe_cache = None, cache_folder = None):
+    
+    # Count the frames that can actually be read from each video, since the reported count is often wrong
+    for each_video_object in video_object_list:
+        each_path = each_video_object.video_source
+        
+        # Re-use previous counts from the probe cache if possible, otherwise scan the video (without decoding)
+        true_frame_count = get_true_frame_count(each_path, probe_cache, cache_folder)
+        if true_frame_count is None:
+            continue
+        
+        # Update the video info, so that frame sampling only targets frames that actually exist
+        reported_frame_count = each_video_object.info("frame_count")
+        if true_frame_count != reported_frame_count and true_frame_count > 0:
+            print("Frame count mismatch: {} (reported {}, actual {})".format(each_video_object.video_name,
+                                                                           reported_frame_count,
+                                                                           true_frame_count))
+            each_video_object.set_frame_count(true_frame_count)
+    
+    # Save any new counts for re-use
+    if probe_cache is not None:
+        probe_cache.save()
 
 # .....................................................................................................................
 
@@ -111,6 +302,107 @@ def get_frame_indices(video_object_list, num_output_frames):
 
 # .....................................................................................................................
 
+def get_time_sampled_frame_indices(video_object_list, num_output_frames, cache_folder = None, probe_cache = None):
+    
+    frame_index_lists = []
+    for each_video_object in video_object_list:
+        
+        # Get frame timing from the index file (scanning for keyframes & the frame count at the same time)
+        video_index = get_video_index(each_video_object.video_source, probe_cache, cache_folder)
+        timestamps_ms = None if video_index is None else video_index["timestamps_ms"]
+        
+        # Fall back to sampling by frame index if the frame timing can't be read
+        if timestamps_ms is None or len(timestamps_ms) == 0:
+            print("Couldn't get frame timing for: {}".format(each_video_object.video_name))
+            frame_index_lists += get_frame_indices([each_video_object], num_output_frames)
+            continue
+        
+        # The timestamp table lists every readable frame, so use it to correct the frame count if needed
+        if len(timestamps_ms) != each_video_object.info("frame_count"):
+            print("Frame count mismatch: {} (reported {}, actual {})".format(each_video_object.video_name,
+                                                                           each_video_object.info("frame_count"),
+                                                                           len(timestamps_ms)))
+            each_video_object.set_frame_count(len(timestamps_ms))
+        
+        # Pick frames evenly spaced in time, so variable framerate videos stay in sync with each other
+        frame_index_lists.append(get_time_sampled_indices(timestamps_ms, num_output_frames))
+    
+    # Save any new scan results for re-use
+    if probe_cache is not None:
+        probe_cache.save()
+    
+    return frame_index_lists
+
+# .....................................................................................................................
+
+def get_sampling_indices(video_object_list, num_output_frames, probe_cache = None):
+    
+    # Sample frames by presentation time (the timing scan also gives the real frame count)
+    if frame_sampling_mode == "time":
+        frame_index_lists = get_time_sampled_frame_indices(video_object_list, num_output_frames,
+                                                           cache_folder_path, probe_cache)
+    
+    # Otherwise sample by frame number, based on the number of frames that can actually be read (if enabled)
+    else:
+        if enable_frame_count_scan:
+            correct_frame_counts(video_object_list, probe_cache, cache_folder_path)
+        frame_index_lists = get_frame_indices(video_object_list, num_output_frames)
+    
+    return apply_recording_timelapse(frame_index_lists)
+
+# .....................................................................................................................
+
+def apply_recording_timelapse(frame_index_lists):
+    
+    # Nothing to drop if every frame is being recorded
+    if recording_timelapse_factor <= 1:
+        return frame_index_lists
+    
+    # Drop the skipped frames up front (the recorder never sees them), so they're never read, resized or tiled
+    write_plan = get_timelapse_plan(len(frame_index_lists[0]), recording_timelapse_factor)
+    
+    return [each_list[write_plan] for each_list in frame_index_lists]
+
+# .....................................................................................................................
+
+def get_keyframe_lists(video_path_list, frame_index_lists, probe_cache = None, cache_folder = None,
+                       always_index = False):
+    
+    keyframe_lists = []
+    for each_path, each_index_list in zip(video_path_list, frame_index_lists):
+        
+        # Seeking can only help if we're skipping over frames (or jumping ahead to the start of a segment)
+        index_steps = np.diff(each_index_list)
+        skips_frames = (len(index_steps) > 0 and np.max(index_steps) > 1)
+        if not (skips_frames or always_index):
+            keyframe_lists.append(None)
+            continue
+        
+        # Re-use keyframe positions from the index file if possible, otherwise scan the video for them
+        video_index = get_video_index(each_path, probe_cache, cache_folder)
+        keyframe_indices = None if video_index is None else video_index["keyframes"]
+        
+        if keyframe_indices is None:
+            print("Couldn't build keyframe index for: {}".format(os.path.basename(each_path)))
+        keyframe_lists.append(keyframe_indices)
+    
+    # Save any new keyframe results for re-use
+    if probe_cache is not None:
+        probe_cache.save()
+    
+    return keyframe_lists
+
+# .....................................................................................................................
+
+def enable_seek_planning(video_object_list, keyframe_lists):
+    
+    # Give keyframe info to each reader, so it can decide when to seek rather than grab every frame
+    for each_video_object, each_keyframe_list in zip(video_object_list, keyframe_lists):
+        if each_keyframe_list is not None:
+            each_video_object.enable_seek_planning(keyframe_indices = each_keyframe_list)
+
+# .....................................................................................................................
+
 def get_tiling_size(video_object_list, num_rows, num_cols, target_max_size = (1280, 720)):
     
     # First figure out the sizing of all the videos
@@ -165,148 +457,1000 @@ def interpret_target_dimensions(dim_string, defaultWH):
 
 # .....................................................................................................................
 
+def get_output_frame_count(runtime_minutes, output_fps):
+    
+    # Calculate the number of frames needed for the output video
+    runtime_seconds = runtime_minutes * 60
+    number_output_frames = int(round(1 + (output_fps * runtime_seconds)))
+    
+    return number_output_frames
+
 # .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Initialize variables
+def get_grid_shape(number_videos, number_columns):
+    
+    # Calculate the required number of rows, based on the number of columns and how many blank cells there will be
+    number_rows = int(np.ceil(number_videos / number_columns))
+    number_blank = int(number_rows*number_columns - number_videos)
+    
+    return number_rows, number_blank
 
-default_fps = 30.0
-default_columns = 2
-progress_bar_update_rate = 16
+# .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Select videos
+def get_tiled_dimensions(outputWH, number_rows, number_columns):
+    
+    # Calculate the tiled width/height
+    tiled_width = int(round(outputWH[0] / number_columns))
+    tiled_height = int(round(outputWH[1] / number_rows))
+    tiledWH = (tiled_width, tiled_height)
+    
+    return tiledWH
 
-# Get video list and name of videos for selection
-video_list = guiLoadMany(windowTitle = "Select video files")
-video_name_list = [os.path.basename(each_file) for each_file in video_list]
-number_videos = len(video_list)
+# .....................................................................................................................
 
-# Open all videos for initial info and then close them (untl we start recording)
-video_objects = get_videos(video_list)
-for each_video_object in video_objects:
-    each_video_object.close()
+def get_composed_dimensions(tiledWH, number_rows, number_columns):
+    
+    # Calculate the size of the full (tiled) output frame, which may differ slightly from the requested size
+    composedWH = (tiledWH[0] * number_columns, tiledWH[1] * number_rows)
+    
+    return composedWH
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Get output timing
+# .....................................................................................................................
 
-# Have the user specify the output time
-runtime_minutes = cli_prompt_with_defaults(prompt_message = "Enter output video length in minutes: ",
-                                           return_type = float, 
-                                           response_on_newline = False)
+def get_input_paths(input_list):
+    
+    # Expand any folders into the (sorted) list of files they contain, so whole folders can be used as inputs
+    video_path_list = []
+    for each_input in input_list:
+        if os.path.isdir(each_input):
+            video_path_list += get_file_list(each_input, return_full_path = True)
+        else:
+            video_path_list.append(each_input)
+    
+    return video_path_list
 
-# Have the user specify the framerate of the output video
-output_fps = cli_prompt_with_defaults(prompt_message = "Enter the output framerate: ",
-                                      default_value = default_fps,
-                                      return_type = float, 
-                                      response_on_newline = False)
+# .....................................................................................................................
 
-# Calculate the number of frames needed for the output video
-runtime_seconds = runtime_minutes * 60
-number_output_frames = int(round(1 + (output_fps * runtime_seconds)))
+def get_encoder_settings(output_path, output_fps, recording_WH = None):
+    
+    # Use ffmpeg for encoding, if selected
+    if recording_backend == "ffmpeg":
+        return {"backend": "ffmpeg", "encoder": ffmpeg_encoder, "preset": ffmpeg_preset, "container": ffmpeg_container}
+    
+    # Switch to the fastest codec that works on this machine, if needed (results are cached per machine)
+    codec = "X264" if recording_codec == "auto" else recording_codec
+    if recording_codec == "auto" and (output_path is not None) and (recording_WH is not None):
+        codec_tester = Video_Recorder(save_path = output_path, recording_FPS = output_fps, codec = codec)
+        best_codec = codec_tester.find_valid_codec(recording_WH, cache_path = codec_cache_path)
+        if best_codec is None:
+            print("")
+            print("No working codecs found, falling back to {}".format(codec))
+        codec = codec_tester.codec
+    
+    return {"backend": "opencv", "codec": codec}
 
+# .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Configure tiling
+def create_recorder(output_path, output_fps, enable_recording = True, recording_WH = None, encoder_threads = None,
+                    encoder_settings = None):
+    
+    # Use the encoder settings of this script, unless given (e.g. so every render farm worker encodes the same way)
+    if encoder_settings is None:
+        encoder_settings = get_encoder_settings(output_path if enable_recording else None, output_fps, recording_WH)
+    
+    # Use ffmpeg for encoding, if selected (it already encodes in a separate process, so doesn't need a thread)
+    if encoder_settings["backend"] == "ffmpeg":
+        return Video_Recorder_FFmpeg(save_path = output_path,
+                                     recording_FPS = output_fps,
+                                     enabled = enable_recording,
+                                     encoder = encoder_settings["encoder"],
+                                     preset = encoder_settings["preset"],
+                                     threads = ffmpeg_threads if (ffmpeg_threads > 0 or encoder_threads is None)
+                                               else encoder_threads,
+                                     container = encoder_settings["container"])
+    
+    # Create recorder (encoding on a background thread, if enabled)
+    if enable_threaded_recording:
+        video_out = Video_Recorder_Threaded(save_path = output_path,
+                                            recording_FPS = output_fps,
+                                            codec = encoder_settings["codec"],
+                                            enabled = enable_recording,
+                                            queue_size = recording_queue_size)
+    else:
+        video_out = Video_Recorder(save_path = output_path,
+                                   recording_FPS = output_fps,
+                                   codec = encoder_settings["codec"],
+                                   enabled = enable_recording)
+    
+    return video_out
 
-# Have the user specify the number of columns to tile
-number_columns = cli_prompt_with_defaults(prompt_message = "Enter the number of columns for tiling: ",
-                                          default_value = default_columns,
-                                          return_type = int, 
-                                          response_on_newline = False)
+# .....................................................................................................................
 
-# Calculate the required number of rows, based on the number of columns and how many blank cells there will be
-number_rows = int(np.ceil(number_videos / number_columns))
-number_blank = int(number_rows*number_columns - number_videos)
+def check_segment_files(segment_paths, encoder_settings = None):
+    
+    # Recorders that couldn't be opened (e.g. unsupported codec) don't write anything, which would otherwise only
+    # show up as a confusing error when joining the segments
+    missing_paths = [each_path for each_path in segment_paths
+                     if (not os.path.exists(each_path)) or (os.path.getsize(each_path) == 0)]
+    if len(missing_paths) > 0:
+        if encoder_settings is None:
+            codec_name = ffmpeg_encoder if recording_backend == "ffmpeg" else recording_codec
+        else:
+            codec_name = encoder_settings.get("encoder", encoder_settings.get("codec"))
+        raise IOError("\n".join(["Missing or empty recording segments ({} / {}):".format(len(missing_paths),
+                                                                                       len(segment_paths)),
+                                  *["  {}".format(each_path) for each_path in missing_paths],
+                                  "The recorder may not support the '{}' codec on this machine".format(codec_name),
+                                  "(try setting recording_codec = \"auto\" to use a working codec)"]))
+
+# .....................................................................................................................
 
-# Try to automatically figure out the tiling size
-defaultWH, default_tiledWH = get_tiling_size(video_objects, number_rows, number_columns)
+def get_thread_budget(video_objects, tiledWH, number_rows, number_columns, total_threads = None):
+    
+    if not enable_thread_budget:
+        return None
+    
+    # Split the cpu between decoding (based on each video's size), resizing & encoding (based on the output size)
+    outputWH = get_composed_dimensions(tiledWH, number_rows, number_columns)
+    streamWH_list = [each_video_object.info("vidWH") for each_video_object in video_objects]
+    total_threads = thread_budget_total if total_threads is None else total_threads
+    
+    return plan_thread_budget(streamWH_list, outputWH, total_threads)
 
-# Have the user specify the output video dimensions
-defaultWH_str = "{} x {}".format(*defaultWH)
-targetWH_str = cli_prompt_with_defaults("Enter output video size (w x h): ", 
-                                        default_value = defaultWH_str,
-                                        return_type = str)
-outputWH = interpret_target_dimensions(targetWH_str, defaultWH)
+# .....................................................................................................................
 
-# Calculate the tiled width/height
-tiled_width = int(round(outputWH[0] / number_columns))
-tiled_height = int(round(outputWH[1] / number_rows))
-tiledWH = (tiled_width, tiled_height)
+def apply_thread_budget(video_objects, thread_budget):
+    
+    if thread_budget is None:
+        return
+    
+    # Set up decoding threads for each video and threading for resizing. Videos that were already opened (for probing)
+    # keep their thread count, so the budget is updated to show the counts that are actually used
+    for video_idx, each_video_object in enumerate(video_objects):
+        each_video_object.set_decoder_threads(thread_budget["decoder_threads"][video_idx])
+        if each_video_object.decoder_threads() is not None:
+            thread_budget["decoder_threads"][video_idx] = each_video_object.decoder_threads()
+    cv2.setNumThreads(thread_budget["resize_threads"])
 
+# .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Set up recording
+def print_thread_budget(video_objects, thread_budget):
+    
+    if thread_budget is None:
+        return
     
-# Set up pathing
-output_path = None
-output_path = guiSave(windowTitle = "Save tiled video", fileTypes=[["video", ".avi"]])
-enable_recording = (output_path is not None)
+    # OpenCV writers don't allow for setting a thread count, so the encoder threads are only reserved in that case
+    encoder_note = "ffmpeg" if recording_backend == "ffmpeg" else "reserved, OpenCV sets it's own encoder threading"
+    video_name_list = [each_video_object.video_name for each_video_object in video_objects]
+    print("")
+    print(thread_budget_report(thread_budget, video_name_list, encoder_note))
 
-# Create recorder
-video_out = Video_Recorder(save_path = output_path,
-                           recording_FPS = output_fps,
-                           enabled = enable_recording)
-video_out.report_start()
+# .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Display setup
+def render_tiled_video(video_objects, frame_index_lists, number_rows, number_columns, tiledWH, 
+                       output_path, output_fps, enable_display = True, probe_cache = None):
+    
+    # Split the output into segments which are rendered in parallel, if enabled
+    if enable_segmented_rendering and (output_path is not None):
+        return render_tiled_video_segmented(video_objects, frame_index_lists, number_rows, number_columns, tiledWH,
+                                            output_path, output_fps, probe_cache)
+    
+    # Get some info about the output
+    number_videos = len(video_objects)
+    number_output_frames = len(frame_index_lists[0])
+    video_list = [each_video_object.video_source for each_video_object in video_objects]
+    
+    # Pick up from where a previous (identical) render left off, if possible
+    enable_recording = (output_path is not None)
+    checkpoint = None
+    start_frame = 0
+    use_checkpoints = can_join_lossless() if enable_checkpoints is None else enable_checkpoints
+    if use_checkpoints and enable_recording:
+        # Segments encoded with a different codec/encoder can't be joined together, so they're part of the signature
+        render_settings = {"tileWH": list(tiledWH), "grid_rows_cols": [number_rows, number_columns],
+                           "output_fps": output_fps, "resize_policy": resize_policy,
+                           "recording_codec": recording_codec, "recording_backend": recording_backend}
+        if recording_backend == "ffmpeg":
+            render_settings.update({"ffmpeg_encoder": ffmpeg_encoder, "ffmpeg_container": ffmpeg_container})
+        render_signature = get_render_signature(video_list, frame_index_lists, render_settings)
+        checkpoint = Render_Checkpoint(output_path, render_signature, number_output_frames)
+        start_frame = checkpoint.resume_index()
+        if start_frame > 0:
+            print("")
+            print("Resuming render from frame {} / {}".format(start_frame, number_output_frames))
+    
+    # Hand out cpu threads to each stage, so large grids don't oversubscribe the cpu
+    # (worker processes open their own readers, so only readers in this process are set up here)
+    thread_budget = get_thread_budget(video_objects, tiledWH, number_rows, number_columns)
+    encoder_threads = None if thread_budget is None else thread_budget["encoder_threads"]
+    if not enable_multiprocess_reading:
+        apply_thread_budget(video_objects, thread_budget)
+    
+    # Create recorder (writing into checkpoint segments, if enabled)
+    composedWH = get_composed_dimensions(tiledWH, number_rows, number_columns)
+    segment_start = start_frame
+    video_out = create_recorder(output_path if checkpoint is None else checkpoint.get_segment_path(segment_start),
+                                output_fps, enable_recording, composedWH, encoder_threads)
+    video_out.report_start()
+    print_thread_budget(video_objects, thread_budget)
+    
+    # Get keyframe positions, so readers can seek between keyframes when sampling sparsely
+    # (or to jump straight to the first frames needed when resuming)
+    keyframe_lists = [None] * number_videos
+    if enable_keyframe_seeking:
+        keyframe_lists = get_keyframe_lists(video_list, frame_index_lists, probe_cache, cache_folder_path,
+                                            always_index = (start_frame > 0))
+    
+    # Hand decoding & resizing over to worker processes, if enabled
+    tile_reader = None
+    if enable_multiprocess_reading:
+        
+        # Readers in this process aren't needed, so make sure they aren't holding videos open
+        for each_video_object in video_objects:
+            each_video_object.close()
+        
+        decoder_threads = None if thread_budget is None else thread_budget["decoder_threads"]
+        resize_threads = None if thread_budget is None else thread_budget["resize_threads"]
+        tile_reader = Tile_Reader_Pool(video_list, [each_list[start_frame:] for each_list in frame_index_lists], tiledWH,
+                                       num_processes = number_reader_processes,
+                                       keyframe_index_lists = keyframe_lists,
+                                       resize_policy = resize_policy,
+                                       decoder_threads = decoder_threads,
+                                       resize_threads = resize_threads)
+        print("")
+        print(tile_reader)
+    
+    else:
+        
+        # Open video objects (if they aren't already) so we can start grabbing frames for recording
+        for each_video_object in video_objects:
+            each_video_object.open()
+        enable_seek_planning(video_objects, keyframe_lists)
+        
+        # Start decoding ahead (in the background) on each of the target frames
+        if isinstance(video_objects[0], Read_Video_Threaded):
+            for each_video_object, each_index_list in zip(video_objects, frame_index_lists):
+                each_video_object.set_frame_plan(each_index_list[start_frame:])
+                each_video_object.start()
+    
+    # Set up the output canvas, with blank cells painted once up front
+    compositor = Tile_Compositor(number_rows, number_columns, tiledWH, num_tiles = number_videos,
+                                 resize_policy = resize_policy)
+    
+    # Set up (rate-limited) display on it's own thread, so it doesn't slow down recording
+    # (skipped entirely when running headless)
+    preview = Threaded_Preview(window_label = "Tiled Frame",
+                               update_rate_hz = preview_rate_hz,
+                               max_displayWH = preview_max_WH,
+                               total_iterations = number_output_frames,
+                               progress_label = "Recording Progress",
+                               enabled = enable_display)
+    preview.start()
+    
+    # Set up timing of each stage of the recording loop
+    profiler = Stage_Profiler(enabled = enable_profiling)
+    
+    # Recording loop. Everything is shut down on the way out, even if the render is interrupted (e.g. Ctrl-C),
+    # so that the recorder, readers and display aren't left running in the background
+    segment_end = start_frame
+    try:
+        for k in range(start_frame, number_output_frames):
+            
+            # Get target frame for each video object (worker processes provide frames already resized to the tile size)
+            if enable_multiprocess_reading:
+                profiler.start("read tiles")
+                frame_list = tile_reader.read_tiles()
+                profiler.end("read tiles")
+                changed_tiles = tile_reader.changed_tiles()
+            else:
+                changed_tiles = get_changed_tiles(frame_index_lists, k, start_frame) if enable_tile_reuse else None
+                frame_list = get_target_frames(video_objects, k, frame_index_lists, profiler, changed_tiles)
+            
+            # Resize each (changed) frame directly into the tiled output image
+            t_start = perf_counter()
+            combined_frame = compositor.compose(frame_list, changed_tiles)
+            compose_sec = perf_counter() - t_start
+            profiler.record("resize", compositor.last_resize_sec)
+            profiler.record("compose", compose_sec - compositor.last_resize_sec)
+            
+            # Composing copies the tiles, so they can be handed back to the worker processes
+            if enable_multiprocess_reading:
+                tile_reader.release_tiles()
+            
+            # Record video!
+            profiler.start("encode")
+            video_out.write(combined_frame, auto_resize = False)
+            profiler.end("encode")
+            
+            # Finish the current segment & start a new one every so often, so that progress isn't lost on crashes
+            segment_end = k + 1
+            if checkpoint is not None and (segment_end - segment_start) >= checkpoint_interval_frames:
+                if segment_end < number_output_frames:
+                    profiler.start("checkpoint")
+                    video_out.close()
+                    checkpoint.mark_complete(segment_start, segment_end)
+                    segment_start = segment_end
+                    next_video_out = create_recorder(checkpoint.get_segment_path(segment_start), output_fps,
+                                                     recording_WH = composedWH, encoder_threads = encoder_threads)
+                    if isinstance(video_out, Video_Recorder_Threaded):
+                        next_video_out.add_stats(video_out.stats())
+                    video_out = next_video_out
+                    profiler.end("checkpoint")
+            
+            # Print occasional progress updates when there is no display
+            if not enable_display:
+                if (k % headless_progress_interval) == 0:
+                    print("  Frame {} / {}".format(k, number_output_frames))
+                continue
+            
+            # Provide user feedback about recording progress (stopping if the user presses q/esc or closes a window)
+            profiler.start("display")
+            continue_recording = preview.update(combined_frame, k + 1)
+            profiler.end("display")
+            if not continue_recording:
+                break
+    
+    finally:
+        
+        # Close recorder (timed, since threaded recording may still have frames to encode)
+        profiler.start("encode flush")
+        video_out.close()
+        profiler.end("encode flush")
+        
+        # Close video reading objects & display windows
+        for each_video_object in video_objects:
+            each_video_object.close()
+        if tile_reader is not None:
+            tile_reader.close()
+        preview.close()
+    
+    # Join the checkpoint segments into the final output. Checkpoint data is only removed if the render completed
+    if checkpoint is not None:
+        checkpoint.mark_complete(segment_start, segment_end)
+        profiler.start("join checkpoints")
+        segment_paths = checkpoint.segment_paths()
+        check_segment_files(segment_paths)
+        if len(segment_paths) == 1 and checkpoint.is_finished():
+            os.replace(segment_paths[0], output_path)
+        elif len(segment_paths) == 1:
+            shutil.copyfile(segment_paths[0], output_path)
+        elif len(segment_paths) > 1:
+            join_segments(segment_paths, output_path, checkpoint.resume_index())
+        profiler.end("join checkpoints")
+        if checkpoint.is_finished():
+            checkpoint.remove()
+        else:
+            print("")
+            print("Render stopped early, re-run with the same settings to resume")
+            print(checkpoint)
+    
+    profiler.finish()
+    video_out.report_end()
+    if isinstance(video_out, Video_Recorder_Threaded):
+        video_out.report_stats()
+        
+    # Report timing for each stage
+    if enable_profiling:
+        print("")
+        print("Tiles drawn: {} / {}".format(compositor.tiles_drawn, number_videos * number_output_frames))
+        print("Tiles re-used: {} / {}".format(compositor.tiles_reused, number_videos * number_output_frames))
+        print("")
+        print(profiler.report_string())
+        if enable_recording:
+            run_info = {"output_path": output_path,
+                        "output_fps": output_fps,
+                        "output_frames": number_output_frames,
+                        "tileWH": list(tiledWH),
+                        "resize_policy": resize_policy,
+                        "grid_rows_cols": [number_rows, number_columns],
+                        "tiles_drawn": compositor.tiles_drawn,
+                        "tiles_reused": compositor.tiles_reused,
+                        "thread_budget": thread_budget,
+                        "videos": video_list}
+            report_path = profiler.save_report("{}.profile.json".format(output_path), run_info)
+            print("")
+            print("Saved timing report:")
+            print(report_path)
 
-# Get frame indices
-frame_index_lists = get_frame_indices(video_objects, number_output_frames)
+# .....................................................................................................................
 
-# Set up display windows
-dispWindow = SimpleWindow("Tiled Frame")
-center_window(dispWindow, frameWH = outputWH)
-prog_bar = Progress_Bar(total_iterations = number_output_frames, 
-                        window_label = "Recording Progress",
-                        update_rate = progress_bar_update_rate)
+def render_tiled_video_segmented(video_objects, frame_index_lists, number_rows, number_columns, tiledWH,
+                                 output_path, output_fps, probe_cache = None):
+    
+    # Get some info about the output
+    number_output_frames = len(frame_index_lists[0])
+    video_list = [each_video_object.video_source for each_video_object in video_objects]
+    video_info_list = [get_probe_info(each_video_object) for each_video_object in video_objects]
+    
+    # Each segment opens it's own readers, so make sure the videos aren't being held open here
+    for each_video_object in video_objects:
+        each_video_object.close()
+    
+    # Get keyframe positions for every video, so each segment can jump straight to it's first frames
+    keyframe_lists = get_keyframe_lists(video_list, frame_index_lists, probe_cache, cache_folder_path,
+                                        always_index = True)
+    
+    # Split up the output frames
+    number_segments = os.cpu_count() if number_render_segments is None else number_render_segments
+    segment_ranges = get_segment_ranges(number_output_frames, number_segments)
+    segment_folder, segment_paths = get_segment_paths(output_path, len(segment_ranges))
+    os.makedirs(segment_folder, exist_ok = True)
+    
+    print("")
+    print("Rendering {} frames in {} segments".format(number_output_frames, len(segment_ranges)))
+    print("  Segments: {}".format(segment_folder))
+    
+    # Render every segment, each in it's own process (with an equal share of the cpu)
+    number_processes = max(1, min(len(segment_ranges), os.cpu_count()))
+    total_threads = os.cpu_count() if thread_budget_total is None else thread_budget_total
+    segment_threads = max(1, total_threads // number_processes)
+    segment_args_list = []
+    for segment_idx, (start_idx, end_idx) in enumerate(segment_ranges):
+        segment_index_lists = [each_list[start_idx:end_idx] for each_list in frame_index_lists]
+        segment_args_list.append((video_list, video_info_list, segment_index_lists, keyframe_lists,
+                                  number_rows, number_columns, tiledWH, segment_paths[segment_idx], output_fps,
+                                  None, None, segment_threads))
+    
+    print("  Threads per segment: {}".format(segment_threads))
+    
+    t_start = perf_counter()
+    with mp.get_context().Pool(processes = number_processes) as pool:
+        segment_results = pool.starmap(render_segment, segment_args_list)
+    render_sec = perf_counter() - t_start
+    
+    for segment_idx, (number_frames, segment_sec) in enumerate(segment_results):
+        print("  Segment {}: {} frames in {:.1f} s".format(segment_idx, number_frames, segment_sec))
+    
+    # Join the segments into the final output (without re-encoding, if possible)
+    check_segment_files(segment_paths)
+    t_start = perf_counter()
+    join_method = join_segments(segment_paths, output_path, number_output_frames)
+    join_sec = perf_counter() - t_start
+    shutil.rmtree(segment_folder, ignore_errors = True)
+    
+    print("")
+    print("Recording finished ({:.1f} s rendering, {:.1f} s joining, {})".format(render_sec, join_sec, join_method))
+    print(output_path)
 
-# Restart video objects so we can start grabbing frames for recording
-for each_video_object in video_objects:
-    each_video_object.reopen()
+# .....................................................................................................................
 
+def render_segment(video_path_list, video_info_list, frame_index_lists, keyframe_lists,
+                   number_rows, number_columns, tiledWH, segment_path, output_fps,
+                   segment_resize_policy = None, progress_callback = None, total_threads = None,
+                   encoder_settings = None):
+    
+    # Open a separate set of readers for this segment, with seek planning, so they can jump to the first frames
+    video_objects = [Video_Reader(each_path, video_info = each_info)
+                     for each_path, each_info in zip(video_path_list, video_info_list)]
+    thread_budget = get_thread_budget(video_objects, tiledWH, number_rows, number_columns, total_threads)
+    apply_thread_budget(video_objects, thread_budget)
+    for each_video_object in video_objects:
+        each_video_object.open()
+    enable_seek_planning(video_objects, keyframe_lists)
+    
+    # Set up output
+    number_output_frames = len(frame_index_lists[0])
+    segment_resize_policy = resize_policy if segment_resize_policy is None else segment_resize_policy
+    compositor = Tile_Compositor(number_rows, number_columns, tiledWH, num_tiles = len(video_objects),
+                                 resize_policy = segment_resize_policy)
+    encoder_threads = None if thread_budget is None else thread_budget["encoder_threads"]
+    composedWH = get_composed_dimensions(tiledWH, number_rows, number_columns)
+    video_out = create_recorder(segment_path, output_fps, recording_WH = composedWH, encoder_threads = encoder_threads,
+                                encoder_settings = encoder_settings)
+    
+    # Recording loop for just this segment
+    t_start = perf_counter()
+    for k in range(number_output_frames):
+        changed_tiles = get_changed_tiles(frame_index_lists, k) if enable_tile_reuse else None
+        frame_list = get_target_frames(video_objects, k, frame_index_lists, changed_tiles = changed_tiles)
+        combined_frame = compositor.compose(frame_list, changed_tiles)
+        video_out.write(combined_frame, auto_resize = False)
+        if progress_callback is not None:
+            progress_callback(k)
+    
+    # Clean up
+    video_out.close()
+    for each_video_object in video_objects:
+        each_video_object.close()
+    
+    return number_output_frames, perf_counter() - t_start
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Recording loop
+# .....................................................................................................................
+
+def create_render_job_from_videos(job_folder, video_objects, frame_index_lists, number_rows, number_columns, tiledWH,
+                                  output_path, output_fps, probe_cache = None):
+    
+    # Record everything a worker needs to know about the inputs, so workers don't need to re-probe them
+    video_list = [each_video_object.video_source for each_video_object in video_objects]
+    input_list = [{"path": each_video_object.video_source, "video_info": get_probe_info(each_video_object)}
+                  for each_video_object in video_objects]
+    for each_video_object in video_objects:
+        each_video_object.close()
+    
+    # Get keyframe positions for every video, so workers can jump straight to the start of each unit of work
+    keyframe_lists = get_keyframe_lists(video_list, frame_index_lists, probe_cache, cache_folder_path,
+                                        always_index = True)
+    
+    # Save the job, including the encoder settings (with 'auto' codecs resolved on this machine), since units
+    # can only be joined together if they were all encoded the same way
+    layout_dict = {"rows": number_rows, "columns": number_columns, "tileWH": list(tiledWH)}
+    composedWH = get_composed_dimensions(tiledWH, number_rows, number_columns)
+    output_dict = {"path": output_path, "fps": output_fps, "resize_policy": resize_policy,
+                   "encoder": get_encoder_settings(output_path, output_fps, composedWH)}
+    render_job = create_render_job(job_folder, input_list, frame_index_lists, keyframe_lists,
+                                   layout_dict, output_dict, frames_per_unit = render_unit_frames)
+    
+    print("")
+    print(render_job)
+    print("")
+    print("Start workers (on any machine that can access the job folder) using:")
+    print("  python3 tylerScript.py --worker {}".format(render_job.job_folder))
+    
+    return render_job
+
+# .....................................................................................................................
+
+def run_render_worker(job_folder):
+    
+    # Load the job description
+    render_job = Render_Job(job_folder)
+    frame_index_lists, keyframe_lists = render_job.load_frame_indices()
+    video_path_list = [each_input["path"] for each_input in render_job.manifest["inputs"]]
+    video_info_list = [each_input["video_info"] for each_input in render_job.manifest["inputs"]]
+    layout_dict = render_job.manifest["layout"]
+    output_dict = render_job.manifest["output"]
+    encoder_settings = output_dict["encoder"]
+    
+    print("")
+    print(render_job)
+    print("  Worker: {}".format(render_job.worker_id))
+    print("  Encoder: {}".format(encoder_settings))
+    
+    # Keep rendering units of work until there are none left to claim
+    while True:
+        unit = render_job.claim_next_unit(stale_lock_sec = render_stale_lock_sec)
+        if unit is None:
+            break
+        
+        print("")
+        print("Rendering unit {} (frames {} to {})".format(unit["index"], unit["start"], unit["end"] - 1))
+        
+        # Let other workers know we're still working on the unit, so it isn't considered abandoned
+        def heartbeat(frame_index):
+            if (frame_index % render_heartbeat_interval) == 0:
+                render_job.heartbeat(unit)
+        
+        # Give up the unit if anything goes wrong, so another worker can take it
+        unit_index_lists = [each_list[unit["start"]:unit["end"]] for each_list in frame_index_lists]
+        unit_temp_path = render_job.get_unit_temp_path(unit)
+        try:
+            _, unit_sec = render_segment(video_path_list, video_info_list, unit_index_lists, keyframe_lists,
+                                         layout_dict["rows"], layout_dict["columns"], layout_dict["tileWH"],
+                                         unit_temp_path, output_dict["fps"],
+                                         segment_resize_policy = output_dict["resize_policy"],
+                                         progress_callback = heartbeat,
+                                         encoder_settings = encoder_settings)
+            check_segment_files([unit_temp_path], encoder_settings)
+        except BaseException:
+            render_job.release_unit(unit)
+            raise
+        
+        render_job.complete_unit(unit, unit_temp_path)
+        print("  Done in {:.1f} s".format(unit_sec))
+    
+    # Whichever worker finds everything is done handles the final merge
+    if render_job.claim_merge(stale_lock_sec = render_stale_lock_sec):
+        merge_render_job(render_job)
+    else:
+        print("")
+        print("No work left to claim")
+        print(render_job)
+
+# .....................................................................................................................
 
-for k in range(number_output_frames):
+def merge_render_job(render_job):
     
-    # Get target frame for each video object
-    frame_list = get_target_frames(video_objects, k, frame_index_lists)
+    # Can't merge until every unit has been rendered
+    if not render_job.all_units_done():
+        print("")
+        print("Can't merge, not all units are done!")
+        print(render_job)
+        return None
     
-    # Resize each frame
-    scaled_frame_list = get_scaled_frames(frame_list, number_blank, tiledWH)
+    # Join all units into the final output (without re-encoding, if possible)
+    output_dict = render_job.manifest["output"]
+    unit_paths = [render_job.get_unit_path(each_unit) for each_unit in render_job.units]
+    join_method = join_segments(unit_paths, output_dict["path"], output_dict["frame_count"])
+    render_job.mark_merged()
     
-    # Stack frames into tiled output image
-    combined_frame = get_stacked_image(scaled_frame_list, number_rows, number_columns)
+    print("")
+    print("Render job merged ({})".format(join_method))
+    print(output_dict["path"])
     
-    # Record video!
-    video_out.write(combined_frame, auto_resize = False)
+    return output_dict["path"]
+
+# .....................................................................................................................
+
+def load_batch_file(batch_path):
+    
+    with open(batch_path, "r") as in_file:
+        batch_dict = json.load(in_file)
+    
+    # Paths in the batch file can be given relative to the batch file itself
+    batch_folder = os.path.dirname(os.path.abspath(batch_path))
+    resolve_path = lambda path: os.path.join(batch_folder, os.path.expanduser(path))
+    video_path_list = get_input_paths([resolve_path(each_input) for each_input in batch_dict["inputs"]])
     
-    # Provide user feedback about recording progress
-    dispWindow.imshow(combined_frame)
-    prog_exists = prog_bar.update()
-    if not prog_exists:
-        break
+    # Fill in defaults for each output, same as running headless
+    output_list = []
+    for each_output in batch_dict["outputs"]:
+        if ("path" not in each_output) or ("minutes" not in each_output):
+            raise ValueError("Batch outputs need a 'path' and 'minutes' entry: {}".format(each_output))
+        output_list.append({"path": resolve_path(each_output["path"]),
+                            "minutes": float(each_output["minutes"]),
+                            "fps": float(each_output.get("fps", default_fps)),
+                            "columns": int(each_output.get("columns", default_columns)),
+                            "size": each_output.get("size", None)})
     
-    reqBreak, keypress = breakByKeypress(1)
-    if reqBreak:
-        break
+    return video_path_list, output_list
 
+# .....................................................................................................................
 
-# ---------------------------------------------------------------------------------------------------------------------
-#%% Clean-up
+def get_batch_frame_order(job_frame_index_lists):
     
-# Close recorder
-video_out.close()
-video_out.report_end()
+    # Label every output frame of every job
+    job_ids = np.concatenate([np.full(len(each_lists[0]), j_idx)
+                              for j_idx, each_lists in enumerate(job_frame_index_lists)])
+    frame_ids = np.concatenate([np.arange(len(each_lists[0])) for each_lists in job_frame_index_lists])
+    number_videos = len(job_frame_index_lists[0])
+    needed_index_lists = [np.concatenate([each_lists[v_idx] for each_lists in job_frame_index_lists])
+                          for v_idx in range(number_videos)]
     
-# Close video reading objects
-for each_video_object in video_objects:
-    each_video_object.close()
+    # Order the frames by the source frames they need, so that every video only needs to be read forwards
+    # (the first video is the primary sort key & the order within each job is kept for ties)
+    sort_keys = [job_ids] + needed_index_lists[::-1]
+    frame_order = np.lexsort(sort_keys)
+    merged_index_lists = [each_list[frame_order] for each_list in needed_index_lists]
     
-cv2.destroyAllWindows()
+    return job_ids[frame_order], frame_ids[frame_order], merged_index_lists
+
+# .....................................................................................................................
+
+def run_batch(batch_path):
+    
+    # Get info for all videos, which are shared by every output
+    video_path_list, output_list = load_batch_file(batch_path)
+    probe_cache = Probe_Cache(probe_cache_path) if enable_probe_cache else None
+    video_objects = get_videos(video_path_list, threaded = enable_threaded_reading, probe_cache = probe_cache)
+    number_videos = len(video_objects)
+    video_list = [each_video_object.video_source for each_video_object in video_objects]
+    
+    # Work out the layout & the frames needed for each output, same as a regular headless render
+    batch_jobs = []
+    for each_output in output_list:
+        number_columns = each_output["columns"]
+        number_output_frames = get_output_frame_count(each_output["minutes"], each_output["fps"])
+        number_rows, number_blank = get_grid_shape(number_videos, number_columns)
+        outputWH, _ = get_tiling_size(video_objects, number_rows, number_columns)
+        if each_output["size"] is not None:
+            outputWH = interpret_target_dimensions(each_output["size"], outputWH)
+        tiledWH = get_tiled_dimensions(outputWH, number_rows, number_columns)
+        frame_index_lists = get_sampling_indices(video_objects, number_output_frames, probe_cache)
+        batch_jobs.append({"output": each_output,
+                           "grid_rows_cols": (number_rows, number_columns),
+                           "tiledWH": tiledWH,
+                           "frame_index_lists": frame_index_lists})
+    
+    # Merge the frames of every output into a single pass over the videos
+    job_order, frame_order, merged_index_lists = get_batch_frame_order([each_job["frame_index_lists"]
+                                                                        for each_job in batch_jobs])
+    union_index_lists = [np.unique(each_list) for each_list in merged_index_lists]
+    number_steps = len(job_order)
+    
+    # Hand out cpu threads, with the encoding share split between every output
+    thread_budget = None
+    if enable_thread_budget:
+        outputWH_list = [get_composed_dimensions(each_job["tiledWH"], *each_job["grid_rows_cols"])
+                         for each_job in batch_jobs]
+        streamWH_list = [each_video_object.info("vidWH") for each_video_object in video_objects]
+        thread_budget = plan_thread_budget(streamWH_list, outputWH_list, thread_budget_total)
+    encoder_threads = None if thread_budget is None else max(1, thread_budget["encoder_threads"] // len(batch_jobs))
+    apply_thread_budget(video_objects, thread_budget)
+    
+    # Readers & recorders are cleaned up in 'finally', so nothing is left running if the batch stops early
+    profiler = Stage_Profiler(enabled = enable_profiling)
+    try:
+        
+        # Set up a compositor & recorder for every output
+        for each_job in batch_jobs:
+            number_rows, number_columns = each_job["grid_rows_cols"]
+            each_job["compositor"] = Tile_Compositor(number_rows, number_columns, each_job["tiledWH"],
+                                                     num_tiles = number_videos, resize_policy = resize_policy)
+            composedWH = get_composed_dimensions(each_job["tiledWH"], number_rows, number_columns)
+            each_job["recorder"] = create_recorder(os.path.abspath(each_job["output"]["path"]),
+                                                   each_job["output"]["fps"],
+                                                   recording_WH = composedWH,
+                                                   encoder_threads = encoder_threads)
+            each_job["recorder"].report_start()
+        print_thread_budget(video_objects, thread_budget)
+        
+        # Get keyframe positions for the combined set of frames, so readers can seek when sampling sparsely
+        keyframe_lists = [None] * number_videos
+        if enable_keyframe_seeking:
+            keyframe_lists = get_keyframe_lists(video_list, union_index_lists, probe_cache, cache_folder_path)
+        
+        # Open the videos, with each reading the combined set of frames needed by every output
+        for each_video_object in video_objects:
+            each_video_object.open()
+        enable_seek_planning(video_objects, keyframe_lists)
+        if isinstance(video_objects[0], Read_Video_Threaded):
+            for each_video_object, each_index_list in zip(video_objects, union_index_lists):
+                each_video_object.set_frame_plan(each_index_list)
+                each_video_object.start()
+        
+        print("")
+        print("Rendering {} outputs ({} frames in total)".format(len(batch_jobs), number_steps))
+        
+        # Recording loop, covering the frames of every output
+        held_frames = [None] * number_videos
+        last_read_index = [-1] * number_videos
+        number_decoded = 0
+        for step in range(number_steps):
+            
+            # Only decode frames that haven't already been read for an earlier output frame. Outputs can (rarely) be
+            # ordered slightly out of sync with each other, in which case the most recently read frame is used
+            read_tiles = [each_list[step] > each_last_index
+                          for each_list, each_last_index in zip(merged_index_lists, last_read_index)]
+            new_frames = get_target_frames(video_objects, step, merged_index_lists, profiler, read_tiles)
+            for v_idx, each_frame in enumerate(new_frames):
+                if read_tiles[v_idx]:
+                    last_read_index[v_idx] = merged_index_lists[v_idx][step]
+                if each_frame is not None:
+                    held_frames[v_idx] = each_frame
+                    number_decoded += 1
+            
+            # Tile the frames into the output this frame belongs to
+            current_job = batch_jobs[job_order[step]]
+            k = frame_order[step]
+            changed_tiles = get_changed_tiles(current_job["frame_index_lists"], k) if enable_tile_reuse else None
+            frame_list = [each_frame if (changed_tiles is None or changed_tiles[v_idx]) else None
+                          for v_idx, each_frame in enumerate(held_frames)]
+            t_start = perf_counter()
+            combined_frame = current_job["compositor"].compose(frame_list, changed_tiles)
+            compose_sec = perf_counter() - t_start
+            profiler.record("resize", current_job["compositor"].last_resize_sec)
+            profiler.record("compose", compose_sec - current_job["compositor"].last_resize_sec)
+            
+            profiler.start("encode")
+            current_job["recorder"].write(combined_frame, auto_resize = False)
+            profiler.end("encode")
+            
+            if (step % headless_progress_interval) == 0:
+                print("  Frame {} / {}".format(step, number_steps))
+        
+    finally:
+        
+        # Close all of the outputs (timed, since threaded recording may still have frames to encode)
+        profiler.start("encode flush")
+        for each_job in batch_jobs:
+            if "recorder" in each_job:
+                each_job["recorder"].close()
+        profiler.end("encode flush")
+        
+        # Close video reading objects (including any reading threads)
+        for each_video_object in video_objects:
+            each_video_object.close()
+    
+    profiler.finish()
+    
+    # Report how much decoding was saved by sharing the videos between outputs
+    number_separate = sum(len(np.unique(each_list)) for each_job in batch_jobs
+                          for each_list in each_job["frame_index_lists"])
+    print("")
+    print("Batch finished!")
+    print("  Frames decoded: {} ({} if each output was rendered separately)".format(number_decoded, number_separate))
+    for each_job in batch_jobs:
+        print("  {}".format(each_job["recorder"].save_path))
+    
+    if enable_profiling:
+        print("")
+        print(profiler.report_string())
+
+# .....................................................................................................................
+
+def run_interactive():
+    
+    # Get video list and name of videos for selection
+    video_list = guiLoadMany(windowTitle = "Select video files")
+    
+    # Get info for all videos, these are kept open (if opened at all) until recording is finished
+    # (videos that can't be read are left out)
+    probe_cache = Probe_Cache(probe_cache_path) if enable_probe_cache else None
+    video_objects = get_videos(video_list, threaded = enable_threaded_reading, probe_cache = probe_cache)
+    number_videos = len(video_objects)
+    
+    # Have the user specify the output time
+    runtime_minutes = cli_prompt_with_defaults(prompt_message = "Enter output video length in minutes: ",
+                                               return_type = float, 
+                                               response_on_newline = False)
+    
+    # Have the user specify the framerate of the output video
+    output_fps = cli_prompt_with_defaults(prompt_message = "Enter the output framerate: ",
+                                          default_value = default_fps,
+                                          return_type = float, 
+                                          response_on_newline = False)
+    
+    # Calculate the number of frames needed for the output video
+    number_output_frames = get_output_frame_count(runtime_minutes, output_fps)
+    
+    # Have the user specify the number of columns to tile
+    number_columns = cli_prompt_with_defaults(prompt_message = "Enter the number of columns for tiling: ",
+                                              default_value = default_columns,
+                                              return_type = int, 
+                                              response_on_newline = False)
+    
+    # Calculate the required number of rows
+    number_rows, number_blank = get_grid_shape(number_videos, number_columns)
+    
+    # Try to automatically figure out the tiling size
+    defaultWH, default_tiledWH = get_tiling_size(video_objects, number_rows, number_columns)
+    
+    # Have the user specify the output video dimensions
+    defaultWH_str = "{} x {}".format(*defaultWH)
+    targetWH_str = cli_prompt_with_defaults("Enter output video size (w x h): ", 
+                                            default_value = defaultWH_str,
+                                            return_type = str)
+    outputWH = interpret_target_dimensions(targetWH_str, defaultWH)
+    tiledWH = get_tiled_dimensions(outputWH, number_rows, number_columns)
+    
+    # Set up pathing
+    output_path = guiSave(windowTitle = "Save tiled video", fileTypes=[["video", ".avi"]])
+    
+    # Get frame indices
+    frame_index_lists = get_sampling_indices(video_objects, number_output_frames, probe_cache)
+    
+    render_tiled_video(video_objects, frame_index_lists, number_rows, number_columns, tiledWH, 
+                       output_path, output_fps, enable_display = True, probe_cache = probe_cache)
+
+# .....................................................................................................................
+
+def run_headless(video_path_list, runtime_minutes, output_path,
+                 output_fps = None, number_columns = None, output_size_str = None, job_folder = None):
+    
+    # Fill in defaults
+    output_fps = default_fps if output_fps is None else output_fps
+    number_columns = default_columns if number_columns is None else number_columns
+    
+    # Get info for all videos, these are kept open (if opened at all) until recording is finished
+    probe_cache = Probe_Cache(probe_cache_path) if enable_probe_cache else None
+    video_objects = get_videos(video_path_list, threaded = enable_threaded_reading, probe_cache = probe_cache)
+    
+    # Figure out the output sizing, using the automatic sizing unless a size was given
+    number_output_frames = get_output_frame_count(runtime_minutes, output_fps)
+    number_rows, number_blank = get_grid_shape(len(video_objects), number_columns)
+    outputWH, _ = get_tiling_size(video_objects, number_rows, number_columns)
+    if output_size_str is not None:
+        outputWH = interpret_target_dimensions(output_size_str, outputWH)
+    tiledWH = get_tiled_dimensions(outputWH, number_rows, number_columns)
+    
+    # Get frame indices
+    frame_index_lists = get_sampling_indices(video_objects, number_output_frames, probe_cache)
+    
+    # Save the work as a job for render workers to pick up, rather than rendering here, if needed
+    if job_folder is not None:
+        return create_render_job_from_videos(job_folder, video_objects, frame_index_lists,
+                                             number_rows, number_columns, tiledWH,
+                                             os.path.abspath(output_path), output_fps, probe_cache)
+    
+    render_tiled_video(video_objects, frame_index_lists, number_rows, number_columns, tiledWH, 
+                       os.path.abspath(output_path), output_fps, enable_display = False, probe_cache = probe_cache)
+
+# .....................................................................................................................
+
+def parse_args():
+    
+    # Set up argument parser. Running without any inputs falls back to the interactive (GUI) mode
+    ap = argparse.ArgumentParser(description = "Combine videos together in a tiled view. "
+                                               "Runs interactively if no inputs are given, "
+                                               "otherwise runs headless (no windows or prompts)")
+    ap.add_argument("inputs", nargs = "*", 
+                    help = "Video files (or folders of videos) to tile, left-to-right, top-to-bottom")
+    ap.add_argument("-m", "--minutes", type = float, help = "Output video length in minutes")
+    ap.add_argument("-o", "--output", type = str, help = "Output video path")
+    ap.add_argument("-f", "--fps", type = float, default = default_fps, help = "Output framerate")
+    ap.add_argument("-c", "--columns", type = int, default = default_columns, help = "Number of tiling columns")
+    ap.add_argument("-s", "--size", type = str, default = None, 
+                    help = "Output video size (w x h). Sized automatically if not provided")
+    ap.add_argument("--job", type = str, default = None, 
+                    help = "Save a render job to the given folder (for render workers), instead of rendering")
+    ap.add_argument("--worker", type = str, default = None, 
+                    help = "Run as a render worker on the given job folder")
+    ap.add_argument("--merge", type = str, default = None, 
+                    help = "Merge the rendered units of the given job folder into the final output")
+    ap.add_argument("--batch", type = str, default = None, 
+                    help = "Render every output listed in the given batch (json) file, sharing the input videos")
+    
+    # Make sure we have everything needed to run without prompts
+    args = ap.parse_args()
+    if len(args.inputs) > 0:
+        if (args.worker is not None) or (args.merge is not None) or (args.batch is not None):
+            ap.error("Inputs can't be given when running as a render worker, merging or running a batch")
+        if args.minutes is None or args.output is None:
+            ap.error("Output length (-m) and output path (-o) are required when inputs are given")
+    
+    return args
+
+# .....................................................................................................................
+
+# .....................................................................................................................
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Initialize variables
+
+default_fps = 30.0
+default_columns = 2
+preview_rate_hz = 5.0
+preview_max_WH = (1280, 720)
+headless_progress_interval = 500
+enable_keyframe_seeking = True
+enable_threaded_reading = True
+enable_multiprocess_reading = False
+number_reader_processes = None
+enable_threaded_recording = True
+recording_queue_size = 8
+recording_codec = "X264"        # Or "auto" to use the fastest working codec on each machine
+recording_timelapse_factor = 1  # Only record every n-th output frame (e.g. for quick previews)
+recording_backend = "opencv"    # "opencv" or "ffmpeg"
+ffmpeg_encoder = "libx264"
+ffmpeg_preset = "veryfast"
+ffmpeg_threads = 0              # Lets ffmpeg decide (replaced by the thread budget, if enabled)
+ffmpeg_container = None         # Picked from the output file extension if not set
+enable_profiling = True
+cache_folder_path = os.path.join(os.path.expanduser("~"), ".cache", "tylerScript")
+enable_probe_cache = True
+probe_cache_path = os.path.join(cache_folder_path, "probe_cache.json")
+codec_cache_path = os.path.join(cache_folder_path, "codec_ranking.json")
+probe_thread_count = 16
+probe_timeout_sec = 30.0
+probe_slow_sec = 3.0
+enable_frame_count_scan = True
+frame_sampling_mode = "time"    # "time" or "index"
+enable_tile_reuse = True
+resize_policy = "auto"          # "auto", "nearest", "linear", "area" or "pyramid"
+enable_segmented_rendering = False
+number_render_segments = None   # Uses the number of cpus if not set
+render_unit_frames = 1800
+render_stale_lock_sec = 600
+render_heartbeat_interval = 100
+enable_checkpoints = None       # Only used if segments can be joined without re-encoding, if not set
+checkpoint_interval_frames = 3000
+enable_thread_budget = True
+thread_budget_total = None      # Uses the number of cpus if not set
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+#%% Main
+
+if __name__ == "__main__":
+    
+    args = parse_args()
+    
+    # Run headless if inputs are given on the command line, otherwise ask the user for everything
+    if args.worker is not None:
+        run_render_worker(args.worker)
+    elif args.merge is not None:
+        merge_render_job(Render_Job(args.merge))
+    elif args.batch is not None:
+        run_batch(args.batch)
+    elif len(args.inputs) > 0:
+        run_headless(get_input_paths(args.inputs), args.minutes, args.output,
+                     output_fps = args.fps, 
+                     number_columns = args.columns, 
+                     output_size_str = args.size,
+                     job_folder = args.job)
+    else:
+        run_interactive()
 
 
 # ---------------------------------------------------------------------------------------------------------------------
@@ -314,10 +1458,4 @@ cv2.destroyAllWindows()
 
 
 # TODOs
-# - Use threaded frame grabbing
-# - Use multiprocessing on each video while getting frames
-# - Consider performing grab/retrieve steps separately when getting frames (so decoding can be skipped if needed)
-# - Come up with better solution for videos that do not have all of 'total_frames'
 # - Add option to include dividing lines when displaying tiled videos
-
-